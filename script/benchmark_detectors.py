@@ -0,0 +1,73 @@
+"""
+This code is used to compare the charset detector backends on the charset test
+mails. Only the bodies that are neither ASCII nor UTF-8 are kept, since those
+are decoded without any detector. The charset detected for each body is
+correct when it decodes the same text as the declared one.
+"""
+import os
+import sys
+import time
+import email
+from glob import glob
+
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, "../src")
+
+from magmail.decode import available_detectors, get_detector  # noqa: E402
+from magmail.decode.inference import needs_detection  # noqa: E402
+from magmail.static import DEFAULT_DETECT_SIZE  # noqa: E402
+
+CHARSET_MAILS_GLOB = "../tests/test_files/eml/charset/*/*.eml"
+
+
+def load_payloads():
+    payloads = []
+    for path in sorted(glob(CHARSET_MAILS_GLOB)):
+        with open(path, "rb") as file:
+            message = email.message_from_binary_file(file)
+
+        payload = message.get_payload(decode=True)
+        charset = message.get_content_charset()
+        if not isinstance(payload, bytes) or charset is None:
+            continue
+        if not needs_detection(payload):
+            continue
+
+        try:
+            payloads.append((payload, payload.decode(charset)))
+        except (UnicodeDecodeError, LookupError):
+            continue
+    return payloads
+
+
+def is_correct(payload, text, charset):
+    if charset is None:
+        return False
+    try:
+        return payload.decode(charset) == text
+    except (UnicodeDecodeError, LookupError):
+        return False
+
+
+def benchmark(name, payloads):
+    detector = get_detector(name)
+
+    start = time.perf_counter()
+    charsets = [
+        detector.detect(payload, DEFAULT_DETECT_SIZE) for payload, _ in payloads
+    ]
+    elapsed = time.perf_counter() - start
+
+    correct = sum(
+        is_correct(payload, text, charset)
+        for (payload, text), charset in zip(payloads, charsets)
+    )
+    return len(payloads) / elapsed, correct / len(payloads)
+
+
+payloads = load_payloads()
+print(f"{len(payloads)} mails to detect")
+print(f"{'detector':<20}{'msgs/s':>10}{'correct':>10}")
+for name in available_detectors():
+    speed, accuracy = benchmark(name, payloads)
+    print(f"{name:<20}{speed:>10.1f}{accuracy:>10.1%}")
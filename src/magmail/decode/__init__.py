@@ -1 +1,6 @@
+from .aliases import _CharsetAliases
+from .context import _DecodeContext
 from .decoder import _Decoder
+from .detectors import _Detector, available_detectors, get_detector
+from .priors import _CharsetPriors, message_hints
+from .diagnostics import _DecodeDiagnostics, _DecodeEvent
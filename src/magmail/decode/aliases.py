@@ -0,0 +1,99 @@
+import codecs
+from functools import lru_cache
+from typing import Dict, Optional
+
+
+# Declared charsets Python has no codec or a narrower one for, and the codec
+# decoding what the mails labelled with them actually contain
+CHARSET_ALIASES = {
+    "unknown-8bit": "shift_jis",
+    "x-sjis": "shift_jis",
+    "x-shift-jis": "shift_jis",
+    "windows-31j": "cp932",
+    "x-euc-jp": "euc_jp",
+    "x-euc": "euc_jp",
+    "ks_c_5601-1987": "cp949",
+    "ks_c_5601": "cp949",
+    "x-windows-949": "cp949",
+    "gb2312": "gb18030",
+    "x-gbk": "gbk",
+    "x-mac-cyrillic": "mac_cyrillic",
+    "iso-8859-8-i": "iso8859_8",
+    "ansi_x3.4-1968": "ascii",
+}
+
+# Raw names cached at most, so odd declarations cannot grow the table forever
+MAX_CACHED_CHARSETS = 4096
+
+# Bytes a charset may leave undecoded out of all 256 and still be single byte
+MAX_SINGLE_BYTE_UNDEFINED = 64
+
+
+def clean_charset(charset: str) -> str:
+    """``charset`` without the quotes, spaces and case of a raw declaration"""
+    return charset.strip().strip("\"'").strip().lower()
+
+
+@lru_cache(maxsize=None)
+def is_single_byte(charset: str) -> bool:
+    """Whether ``charset`` maps almost every byte to a character on its own,
+    like latin-1, koi8 or cp125x, so that it decodes nearly any payload
+    """
+    try:
+        decoded = codecs.decode(bytes(range(0x100)), charset, "replace")
+    except Exception:
+        # Unknown charsets, and custom codecs failing on arbitrary bytes
+        return False
+
+    return len(decoded) == 0x100 and decoded.count("\ufffd") < MAX_SINGLE_BYTE_UNDEFINED
+
+
+class _CharsetAliases:
+    """Codecs of raw declared charset names, resolved once.
+
+    Names are cleaned and mapped through ``CHARSET_ALIASES`` and the extra
+    ``aliases`` before the codec lookup. Unknown names are cached as None.
+    """
+
+    def __init__(self, aliases: Optional[Dict[str, str]] = None) -> None:
+        self.aliases = {
+            clean_charset(alias): charset
+            for alias, charset in {**CHARSET_ALIASES, **(aliases or {})}.items()
+        }
+        self.codecs: Dict[str, Optional[codecs.CodecInfo]] = {}
+
+    def __len__(self) -> int:
+        return len(self.codecs)
+
+    def add(self, alias: str, charset: str) -> None:
+        alias = clean_charset(alias)
+        self.aliases[alias] = charset
+        self.codecs = {
+            raw: codec
+            for raw, codec in self.codecs.items()
+            if clean_charset(raw) != alias
+        }
+
+    def lookup(self, charset: str) -> Optional[codecs.CodecInfo]:
+        """The codec of ``charset``, or None when there is none"""
+        try:
+            return self.codecs[charset]
+        except KeyError:
+            pass
+
+        name = clean_charset(charset)
+        try:
+            codec: Optional[codecs.CodecInfo] = codecs.lookup(
+                self.aliases.get(name, name)
+            )
+        except LookupError:
+            codec = None
+
+        if len(self.codecs) < MAX_CACHED_CHARSETS:
+            self.codecs[charset] = codec
+        return codec
+
+    def name(self, charset: str) -> Optional[str]:
+        """The codec name of ``charset``, or None when there is none"""
+        codec = self.lookup(charset)
+        return codec.name if codec is not None else None
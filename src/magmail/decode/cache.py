@@ -0,0 +1,75 @@
+import sys
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+
+# A decode failure: its kind and the encoding it was recorded with
+CACHE_FAILURE_TYPE = Tuple[str, Optional[str]]
+# The decoded text, the final encoding, the original encoding and the decode
+# confidence of a payload, with the counters and failures its decode recorded
+CACHE_ENTRY_TYPE = Tuple[
+    str,
+    Optional[str],
+    Optional[str],
+    float,
+    Tuple[str, ...],
+    Tuple[CACHE_FAILURE_TYPE, ...],
+]
+CACHE_KEY_TYPE = Tuple[bytes, Optional[str]]
+
+
+class _DecodeCache:
+    """LRU cache of decoded payloads, keyed by payload digest and declared charset.
+
+    The decoded texts take at most about ``max_size`` bytes of memory; the
+    least recently used ones are evicted first.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.entries: "OrderedDict[CACHE_KEY_TYPE, CACHE_ENTRY_TYPE]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @staticmethod
+    def key(byte: bytes, encoding: Optional[str]) -> CACHE_KEY_TYPE:
+        return hashlib.blake2b(byte, digest_size=16).digest(), encoding
+
+    @staticmethod
+    def _entry_size(entry: CACHE_ENTRY_TYPE) -> int:
+        return sys.getsizeof(entry[0])
+
+    def get(self, key: CACHE_KEY_TYPE) -> Optional[CACHE_ENTRY_TYPE]:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key: CACHE_KEY_TYPE, entry: CACHE_ENTRY_TYPE) -> None:
+        entry_size = self._entry_size(entry)
+        if entry_size > self.max_size or key in self.entries:
+            return
+
+        self.entries[key] = entry
+        self.size += entry_size
+
+        while self.size > self.max_size:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= self._entry_size(evicted)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self),
+            "size": self.size,
+        }
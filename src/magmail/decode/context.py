@@ -0,0 +1,159 @@
+import uuid
+from collections import Counter
+from weakref import WeakValueDictionary
+from pathlib import Path
+from typing import Any, Dict, List, MutableMapping, Optional, Tuple, Union
+
+from magmail.static import (
+    DEFAULT_DECODE_MODE,
+    DEFAULT_DETECT_SIZE,
+    DEFAULT_DETECTOR,
+    DEFAULT_MAX_DECODE_EVENTS,
+)
+from magmail.similar_charset import SIMILAR_CHARSET_DICT, similar_charset_key
+from .aliases import _CharsetAliases
+from .cache import _DecodeCache
+from .detectors import get_detector
+from .diagnostics import _DecodeDiagnostics
+from .priors import _CharsetPriors
+
+
+# Contexts of this process by key
+_CONTEXTS: MutableMapping[str, "_DecodeContext"] = WeakValueDictionary()
+# Contexts first met while unpickling, in a worker process, kept for its life
+_WORKER_CONTEXTS: Dict[str, "_DecodeContext"] = {}
+
+
+def get_decode_context(key: str, settings: Dict[str, Any]) -> "_DecodeContext":
+    """The context ``key`` of this process, created on first use"""
+    context = _CONTEXTS.get(key)
+    if context is None:
+        context = _WORKER_CONTEXTS[key] = _DecodeContext(key, **settings)
+    return context
+
+
+class _DecodeContext:
+    """State shared by all the decoders of a Magmail run.
+
+    A context is pickled as a reference: in a worker process it unpickles to
+    the context of the same key of that process. What a worker records is
+    sent back with ``collect`` and added to the parent context with ``merge``.
+    """
+
+    def __init__(
+        self,
+        key: Optional[str] = None,
+        detect_size: Optional[int] = DEFAULT_DETECT_SIZE,
+        cache_size: Optional[int] = None,
+        priors_path: Optional[Union[str, Path]] = None,
+        detector: str = DEFAULT_DETECTOR,
+        max_decode_events: int = DEFAULT_MAX_DECODE_EVENTS,
+        decode_mode: str = DEFAULT_DECODE_MODE,
+        charset_aliases: Optional[Dict[str, str]] = None,
+    ) -> None:
+        self.key = key if key is not None else uuid.uuid4().hex
+        # Detection reads at most the first ``detect_size`` bytes of a
+        # payload, all of them when None
+        self.detect_size = detect_size
+        self.detector_name = detector
+        self.detector = get_detector(detector)
+        # Bytes of decoded payloads cached in each process
+        self.cache_size = cache_size
+        self.cache: Optional[_DecodeCache] = (
+            _DecodeCache(cache_size) if cache_size is not None else None
+        )
+        # Charsets that decoded the mails of a sender, a mailer or a declared
+        # charset, loaded from and saved to ``priors_path``
+        self.priors_path = priors_path
+        self.priors: Optional[_CharsetPriors] = None
+        if priors_path is not None:
+            self.priors = _CharsetPriors(priors_path)
+            self.priors.load()
+        # How many payloads took each decoding path
+        self.counters: "Counter[str]" = Counter()
+        self.max_decode_events = max_decode_events
+        # "replace" decodes a payload in at most two passes, replacing what
+        # cannot be decoded, instead of trying charsets until one is strict
+        self.decode_mode = decode_mode
+        # Declared charsets are resolved to codecs with ``charset_aliases``
+        # first
+        self.charset_aliases = charset_aliases
+        self.aliases = _CharsetAliases(charset_aliases)
+        # The last ``max_decode_events`` decode failures
+        self.diagnostics = _DecodeDiagnostics(max_decode_events)
+        # How many times a similar charset decoded a payload of a declared
+        # one, in total and since the last collect
+        self.similar_successes: "Counter[Tuple[str, str]]" = Counter()
+        self.new_similar_successes: "Counter[Tuple[str, str]]" = Counter()
+
+        _CONTEXTS[self.key] = self
+
+    def __reduce__(self) -> Any:
+        return get_decode_context, (self.key, self.settings())
+
+    def settings(self) -> Dict[str, Any]:
+        """Arguments creating the same context in a worker process"""
+        return {
+            "detect_size": self.detect_size,
+            "cache_size": self.cache_size,
+            "priors_path": self.priors_path,
+            "detector": self.detector_name,
+            "max_decode_events": self.max_decode_events,
+            "decode_mode": self.decode_mode,
+            "charset_aliases": self.charset_aliases,
+        }
+
+    def count(self, name: str) -> None:
+        self.counters[name] += 1
+
+    def similar_charsets(self, charset: str) -> List[str]:
+        """Charsets similar to ``charset``, the ones that most often decoded its
+        payloads first
+        """
+        key = similar_charset_key(charset)
+        return sorted(
+            SIMILAR_CHARSET_DICT.get(key, []),
+            key=lambda similar: -self.similar_successes[key, similar],
+        )
+
+    def count_similar(self, charset: str, similar: str) -> None:
+        key = similar_charset_key(charset), similar
+        self.similar_successes[key] += 1
+        self.new_similar_successes[key] += 1
+
+    def collect(self) -> Dict[str, Any]:
+        """Take what was recorded since the last call"""
+        report: Dict[str, Any] = {
+            "counters": dict(self.counters),
+            "similar_successes": dict(self.new_similar_successes),
+            "diagnostics": self.diagnostics.collect(),
+        }
+        self.counters.clear()
+        self.new_similar_successes.clear()
+
+        if self.cache is not None:
+            report["cache"] = {"hits": self.cache.hits, "misses": self.cache.misses}
+            self.cache.hits = self.cache.misses = 0
+
+        if self.priors is not None:
+            report["priors"] = self.priors.collect()
+        return report
+
+    def merge(self, report: Dict[str, Any]) -> None:
+        self.counters.update(report["counters"])
+        self.similar_successes.update(report["similar_successes"])
+        self.diagnostics.merge(report["diagnostics"])
+
+        if self.cache is not None and "cache" in report:
+            self.cache.hits += report["cache"]["hits"]
+            self.cache.misses += report["cache"]["misses"]
+
+        if self.priors is not None and "priors" in report:
+            self.priors.merge(report["priors"])
+
+    def save_priors(self) -> None:
+        if self.priors is not None:
+            self.priors.save()
+
+
+DEFAULT_DECODE_CONTEXT = _DecodeContext("default")
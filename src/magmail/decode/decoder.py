@@ -1,101 +1,445 @@
 import codecs
-import chardet
+import threading
 from enum import Enum
-from typing import Callable, Optional, Union
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence, Tuple, Union
 
 from magmail.errors import CannotDetectEncodingError, UnknownEncodingType
 from magmail.decode.charsets import search_iso_2022_jp_ms
-from magmail.similar_charset import SIMILAR_CHARSET_DICT
+from magmail.decode.context import DEFAULT_DECODE_CONTEXT, _DecodeContext
+from magmail.decode.detectors import DETECT_CHUNK_SIZE
+from magmail.decode.diagnostics import _DecodeEvent
+from magmail.decode.inference import UNKNOWN_8BIT, needs_detection
 
 
 codecs.register(search_iso_2022_jp_ms)
 
+# ISO-2022 and HZ encodings are 7 bit, so an ASCII payload may still need them
+SHIFT_SEQUENCES = [b"\x1b", b"~{"]
+
+# Error handler replacing undecodable bytes like "replace", and counting them
+COUNT_REPLACE_ERRORS = "magmail-count-replace"
+
+# Share of replaced bytes above which the declared or prior charset is
+# taken for a wrong label, and the detected one is tried too
+MAX_REPLACED_SHARE = 0.01
+
+# Bytes replaced by the handler in this thread
+_replaced = threading.local()
+
+
+def count_replace(error: UnicodeError) -> Tuple[str, int]:
+    if not isinstance(error, UnicodeDecodeError):
+        raise error
+    _replaced.count += error.end - error.start
+    return "\ufffd", error.end
+
+
+codecs.register_error(COUNT_REPLACE_ERRORS, count_replace)
+
 
 class _Decoder:
     def __init__(
-        self, byte: bytes, encoding: Optional[str], errors: Optional[str] = None
+        self,
+        byte: bytes,
+        encoding: Optional[str],
+        errors: Optional[str] = None,
+        context: Optional[_DecodeContext] = None,
+        hints: Sequence[str] = (),
+        mail_index: Optional[int] = None,
+        path: Optional[Union[str, Path]] = None,
+        part: Optional[str] = None,
+        message_charset: Optional[Callable[[], Optional[str]]] = None,
     ) -> None:
         self.byte = byte
         self.encoding: Optional[str] = encoding
+        self.declared_encoding = encoding
         self.errors = errors
+        self.context = context if context is not None else DEFAULT_DECODE_CONTEXT
         self.original_encoding: Optional[str] = None
+        self.detected = False
+        # Whether the charset was detected from only a sample of the payload
+        self.sampled = False
         self.decoded = ""
+        # Share of the payload decoded without replacement, 0.0 when it
+        # could not be decoded at all
+        self.confidence = 1.0
+        self.hints = hints
+        # Where the payload comes from, for the decode diagnostics
+        self.mail_index = mail_index
+        self.path = path
+        self.part = part
+        # Charset inferred once from all the undeclared bytes of the mail
+        self.message_charset = message_charset
+        # What the decode recorded, replayed when the cache has its result
+        self.counted: List[str] = []
+        self.failures: List[Tuple[str, Optional[str]]] = []
+
+    def count(self, name: str) -> None:
+        self.counted.append(name)
+        self.context.count(name)
 
     def detect_charset(self) -> None:
         self.original_encoding = self.encoding
-        self.encoding = chardet.detect(self.byte)["encoding"]
+        detect_size = self.context.detect_size
+        self.encoding = self.detect_sample(detect_size)
+        self.sampled = detect_size is not None and len(self.byte) > DETECT_CHUNK_SIZE
+        self.detected = True
+        self.count("detected")
 
         if self.encoding is None:
             self.__decode_error()
 
+    def detect_sample(self, size: Optional[int]) -> Optional[str]:
+        """Detect the charset from at most the first ``size`` bytes, with the
+        detector backend of the context
+        """
+        return self.context.detector.detect(self.byte, size)
+
+    def detect_whole(self) -> bool:
+        """Detect the charset again from the whole payload, when it could not
+        be decoded with the one detected from a sample
+        """
+        if not self.sampled:
+            return False
+
+        self.sampled = False
+        encoding = self.detect_sample(None)
+        if encoding is None:
+            return False
+        self.encoding = encoding
+        return True
+
     def decode(self) -> None:
+        """Decode ``byte``, or take the result of an identical payload from the cache"""
+        decode_payload = (
+            self.replace_decode
+            if self.context.decode_mode == "replace"
+            else self.decode_payload
+        )
+
+        cache = self.context.cache
+        if cache is None:
+            decode_payload()
+            return
+
+        key = cache.key(self.byte, self.encoding)
+        entry = cache.get(key)
+        if entry is not None:
+            (
+                self.decoded,
+                self.encoding,
+                self.original_encoding,
+                self.confidence,
+                counted,
+                failures,
+            ) = entry
+            # Counted and reported like the payload the result was cached for
+            for name in counted:
+                self.count(name)
+            for kind, encoding in failures:
+                self.replay_failure(kind, encoding)
+            return
+
+        decode_payload()
+        cache.put(
+            key,
+            (
+                self.decoded,
+                self.encoding,
+                self.original_encoding,
+                self.confidence,
+                tuple(self.counted),
+                tuple(self.failures),
+            ),
+        )
+
+    def replay_failure(self, kind: str, encoding: Optional[str]) -> None:
+        decoded_encoding, self.encoding = self.encoding, encoding
+        if kind == "unknown_encoding":
+            self.__unknown_encoding_error()
+        elif kind == "undecodable":
+            self.__decode_error()
+        else:
+            self._warning_decode(kind)
+        self.encoding = decoded_encoding
+
+    def decode_payload(self) -> None:
+        if self.is_raw_8bit() and (self.fast_decode() or self.message_decode()):
+            return
+
         if self.encoding:
+            if not self.detected:
+                self.count("declared")
+
+            codec = self.context.aliases.lookup(self.encoding)
+            if codec is None:
+                self.__unknown_encoding_error()
+                return
+
+            self.encoding = codec.name
+            try:
+                self.decoded = codec.decode(self.byte)[0]
+                if self.detected:
+                    self.learn(self.encoding)
+            except UnicodeDecodeError:
+                # The sample was not representative of the whole payload
+                if self.detect_whole():
+                    self.decode_payload()
+                    return
+                self.variant_decode()
+        elif (
+            not self.fast_decode()
+            and not self.prior_decode()
+            and not self.message_decode()
+        ):
+            self.detect_charset()
+            # An undetectable charset was already reported by detect_charset
+            if self.encoding is not None:
+                self.decode_payload()
+
+    def fast_decode(self) -> bool:
+        """Decode an undeclared ASCII or UTF-8 payload without detecting its charset"""
+        if self.byte.isascii():
+            if any(sequence in self.byte for sequence in SHIFT_SEQUENCES):
+                return False
+            self.encoding = "ascii"
+            self.decoded = self.byte.decode("ascii")
+        else:
             try:
-                if self.encoding == "unknown-8bit":
-                    self.encoding = "shift-jis"
-
-                codecs.lookup(self.encoding)
-                try:
-                    self.decoded = codecs.decode(self.byte, encoding=self.encoding)
-                except (UnicodeDecodeError, LookupError):
-                    self.variant_decode()
-            except LookupError:
+                self.decoded = self.byte.decode("utf-8")
+            except UnicodeDecodeError:
+                return False
+            self.encoding = "utf-8"
+
+        self.count(self.encoding)
+        return True
+
+    def is_raw_8bit(self) -> bool:
+        """Whether the payload is raw 8 bit header bytes of a mail, whose
+        ``unknown-8bit`` charset was not declared by the sender
+        """
+        return (
+            self.message_charset is not None
+            and not self.detected
+            and self.encoding is not None
+            and self.encoding.lower() == UNKNOWN_8BIT
+        )
+
+    def message_decode(self) -> bool:
+        """Decode an undeclared payload with the charset inferred for its mail,
+        instead of detecting one for this payload alone
+        """
+        if self.message_charset is None:
+            return False
+
+        charset = self.message_charset()
+        codec = self.context.aliases.lookup(charset) if charset is not None else None
+        if codec is None:
+            return False
+
+        try:
+            self.decoded = codec.decode(self.byte)[0]
+        except UnicodeDecodeError:
+            return False
+
+        if self.encoding is not None:
+            self.original_encoding = self.encoding
+        self.encoding = codec.name
+        self.count("message")
+        self.learn(self.encoding)
+        return True
+
+    def replace_payload(self, charset: str) -> Tuple[str, int]:
+        """Decode with ``charset`` in one pass, with the bytes it replaced"""
+        codec = self.context.aliases.lookup(charset)
+        if codec is None:
+            return "", len(self.byte)
+
+        _replaced.count = 0
+        try:
+            decoded: str = codec.decode(self.byte, COUNT_REPLACE_ERRORS)[0]
+        except UnicodeDecodeError:
+            # A codec ignoring error handlers, which decodes nothing then
+            return "", len(self.byte)
+        replaced: int = _replaced.count
+        return decoded, replaced
+
+    def replace_candidate(self) -> None:
+        """Take the charset an undeclared payload is first decoded with in
+        ``replace`` mode: UTF-8 when the start of the payload is, else the
+        prior or mail charset
+        """
+        if not self.byte.isascii() and not needs_detection(
+            self.byte, self.context.detect_size or DETECT_CHUNK_SIZE
+        ):
+            self.encoding = "utf-8"
+            self.count(self.encoding)
+            return
+
+        candidates = (
+            self.context.priors.candidates(self.prior_hints())
+            if self.context.priors is not None
+            else []
+        )
+        name = self.context.aliases.name(candidates[0]) if candidates else None
+        if name is not None:
+            self.encoding = name
+            self.count("prior")
+        elif self.message_charset is not None:
+            charset = self.message_charset()
+            name = self.context.aliases.name(charset) if charset is not None else None
+            if name is not None:
+                self.encoding = name
+                self.count("message")
+
+    def replace_decode(self) -> None:
+        """Decode without retry cascade: once with the declared, UTF-8, prior
+        or mail charset, replacing the bytes it cannot decode, and once more
+        with the detected charset when the first pass replaced too many.
+        """
+        if self.is_raw_8bit():
+            self.original_encoding, self.encoding = self.encoding, None
+
+        if self.encoding:
+            name = self.context.aliases.name(self.encoding)
+            if name is None:
                 self.__unknown_encoding_error()
+                self.original_encoding = self.encoding
+            self.encoding = name
+
+        replaced = 0
+        if self.encoding:
+            self.count("declared")
+            self.decoded, replaced = self.replace_payload(self.encoding)
+        elif self.byte.isascii() and self.fast_decode():
+            return
         else:
-            self.detect_charset()
-            self.decode()
+            # UTF-8 is checked by this pass, not by a strict one before it
+            self.replace_candidate()
+            if self.encoding is not None:
+                self.decoded, replaced = self.replace_payload(self.encoding)
+
+        if self.encoding is None or replaced > MAX_REPLACED_SHARE * len(self.byte):
+            self.detected = True
+            self.count("detected")
+            detected = self.detect_sample(self.context.detect_size)
+            name = self.context.aliases.name(detected) if detected is not None else None
+
+            if name is not None and name != self.encoding:
+                decoded, detected_replaced = self.replace_payload(name)
+                if self.encoding is None or detected_replaced < replaced:
+                    if self.encoding is not None:
+                        self.original_encoding = self.encoding
+                    self.encoding = name
+                    self.decoded, replaced = decoded, detected_replaced
+                    self.learn(name)
+
+        if self.encoding is None:
+            self.__decode_error()
+            return
+
+        self.confidence = 1 - replaced / len(self.byte) if self.byte else 1.0
+        if replaced:
+            self._warning_decode("replaced")
+
+    def prior_hints(self) -> List[str]:
+        hints = list(self.hints)
+        if self.declared_encoding:
+            hints.append("charset:" + self.declared_encoding.lower())
+        return hints
+
+    def prior_decode(self) -> bool:
+        """Decode with the charsets that worked for the same sender, mailer or
+        declared charset, before trying similar charsets or detecting one
+        """
+        priors = self.context.priors
+        if priors is None:
+            return False
+
+        for charset in priors.candidates(self.prior_hints()):
+            if charset == self.encoding:
+                continue
+            try:
+                self.decoded = codecs.decode(self.byte, encoding=charset)
+            except (UnicodeDecodeError, LookupError):
+                continue
+
+            if not self.detected:
+                self.original_encoding = self.encoding
+            self.encoding = charset
+            self.count("prior")
+            self.learn(charset)
+            return True
+
+        return False
+
+    def learn(self, charset: str) -> None:
+        """Record ``charset`` as the one decoding this payload when the declared one did not"""
+        priors = self.context.priors
+        if priors is not None:
+            priors.record(self.prior_hints(), charset)
 
     def variant_decode(self) -> None:
         if self.encoding is None:
             self.detect_charset()
             assert self.encoding is not None
 
-        try:
-            self.encoding = codecs.lookup(self.encoding).name
-        except LookupError:
-            pass
-
-        if self.encoding.lower() in SIMILAR_CHARSET_DICT.keys():
-            for similar_charset in SIMILAR_CHARSET_DICT[self.encoding.lower()]:
-                try:
-                    self.decoded = codecs.decode(self.byte, encoding=similar_charset)
-                    self.encoding = similar_charset
-                    return
-                except (UnicodeDecodeError, LookupError):
-                    continue
+        if self.prior_decode():
+            return
+
+        self.encoding = self.context.aliases.name(self.encoding) or self.encoding
+
+        for similar_charset in self.context.similar_charsets(self.encoding):
+            try:
+                self.decoded = codecs.decode(self.byte, encoding=similar_charset)
+            except (UnicodeDecodeError, LookupError):
+                continue
+
+            self.count("similar")
+            self.context.count_similar(self.encoding, similar_charset)
+            self.encoding = similar_charset
+            self.learn(similar_charset)
+            return
 
         if self.original_encoding is None:
             self.detect_charset()
-            self.decode()
+            # An undetectable charset was already reported by detect_charset
+            if self.encoding is not None:
+                self.decode_payload()
             return
 
         self.__decode_error()
 
-    def _warning_decode(self) -> None:
-        print("Warning!!! Decoding")
-        print("Encoding:", self.encoding)
-        print("Body: ")
-        print(self.byte)
-        print("=" * 32)
+    def _warning_decode(self, kind: str) -> None:
+        """Record the failure in the diagnostics of the context, logging it
+        unless errors are ignored
+        """
+        if kind != "replaced":
+            self.confidence = 0.0
+        self.failures.append((kind, self.encoding))
+        self.context.diagnostics.record(
+            _DecodeEvent(
+                kind,
+                self.encoding,
+                self.byte,
+                mail_index=self.mail_index,
+                path=self.path,
+                part=self.part,
+            ),
+            log=self.errors != "ignore",
+        )
 
     def __unknown_encoding_error(self) -> None:
-        if self.errors == "warning" or self.errors is None:
-            print("UNKNOWN")
-            self._warning_decode()
-        elif self.errors == "exception":
+        if self.errors == "exception":
             raise UnknownEncodingType(
                 "Unable to detect character encoding, so decoding is not possible."
             )
-        elif self.errors == "ignore":
-            pass
+        self._warning_decode("unknown_encoding")
 
     def __decode_error(self) -> None:
-        if self.errors == "warning" or self.errors is None:
-            print("ERROR")
-            self._warning_decode()
-        elif self.errors == "exception":
+        if self.errors == "exception":
             raise CannotDetectEncodingError(
                 "Unable to detect character encoding, so decoding is not possible."
             )
-        elif self.errors == "ignore":
-            pass
+        self._warning_decode("undecodable")
@@ -0,0 +1,204 @@
+import re
+import codecs
+from abc import ABC, abstractmethod
+import chardet
+from chardet.universaldetector import UniversalDetector
+from typing import Any, Dict, List, Optional, Pattern, Tuple, Type
+
+
+# Bytes fed to the detector at a time, until it is confident
+DETECT_CHUNK_SIZE = 4096
+
+# Kana, ideographs, Hangul and their punctuation, then the lowercase letters of
+# single byte scripts, which make most of a text in them
+JAPANESE_REGEX = re.compile("[\u3040-\u30ff\u4e00-\u9fff\u3000-\u303f\uff01-\uff9f]")
+CHINESE_REGEX = re.compile("[\u4e00-\u9fff\u3000-\u303f\uff01-\uff5e]")
+KOREAN_REGEX = re.compile("[\uac00-\ud7a3\u3000-\u303f]")
+CYRILLIC_REGEX = re.compile("[\u0430-\u045f]")
+GREEK_REGEX = re.compile("[\u03ac-\u03ce]")
+HEBREW_REGEX = re.compile("[\u05d0-\u05ea]")
+THAI_REGEX = re.compile("[\u0e01-\u0e5b]")
+
+ASCII_LETTER_REGEX = re.compile(b"[A-Za-z]")
+NON_ASCII_REGEX = re.compile(b"[\x80-\xff]")
+
+# Charsets tried by the heuristic, with the characters a text in them is
+# expected to be made of. The first one explaining the most characters wins.
+HEURISTIC_MULTIBYTE_CHARSETS: List[Tuple[str, Pattern[str]]] = [
+    ("euc_kr", KOREAN_REGEX),
+    ("euc_jp", JAPANESE_REGEX),
+    ("cp932", JAPANESE_REGEX),
+    ("gb18030", CHINESE_REGEX),
+    ("big5", CHINESE_REGEX),
+]
+HEURISTIC_SINGLE_BYTE_CHARSETS: List[Tuple[str, Pattern[str]]] = [
+    ("cp1251", CYRILLIC_REGEX),
+    ("koi8_r", CYRILLIC_REGEX),
+    ("cp1253", GREEK_REGEX),
+    ("cp1255", HEBREW_REGEX),
+    ("cp874", THAI_REGEX),
+]
+HEURISTIC_SHIFT_CHARSETS = ["iso2022_jp", "iso2022_jp_2", "iso2022_jp_ext", "hz"]
+# A text mostly made of ASCII letters, and the payloads nothing else decodes
+HEURISTIC_LATIN_CHARSET = "cp1252"
+HEURISTIC_FALLBACK_CHARSET = "latin-1"
+# Share of the non ASCII characters a charset has to explain
+HEURISTIC_MIN_SCORE = 0.5
+
+
+class _Detector(ABC):
+    """Guess the charset of a payload from at most its first ``size`` bytes"""
+
+    name = ""
+
+    @abstractmethod
+    def detect(self, byte: bytes, size: Optional[int] = None) -> Optional[str]:
+        ...
+
+
+class _ChardetDetector(_Detector):
+    name = "chardet"
+
+    def detect(self, byte: bytes, size: Optional[int] = None) -> Optional[str]:
+        """The detector is fed chunk by chunk and stops as soon as it is
+        confident, so large payloads are not read to the end.
+        """
+        if size is None or len(byte) <= DETECT_CHUNK_SIZE:
+            encoding: Optional[str] = chardet.detect(byte)["encoding"]
+            return encoding
+
+        detector = UniversalDetector()
+        with memoryview(byte) as view:
+            for start in range(0, min(len(byte), size), DETECT_CHUNK_SIZE):
+                detector.feed(view[start : start + DETECT_CHUNK_SIZE])
+                if detector.done:
+                    break
+        detector.close()
+
+        encoding = detector.result["encoding"]
+        return encoding
+
+
+class _CchardetDetector(_Detector):
+    name = "cchardet"
+
+    def __init__(self) -> None:
+        try:
+            import cchardet
+        except ImportError as error:
+            raise ImportError(
+                "The 'cchardet' detector requires the cchardet package."
+            ) from error
+        self.module: Any = cchardet
+
+    def detect(self, byte: bytes, size: Optional[int] = None) -> Optional[str]:
+        encoding: Optional[str] = self.module.detect(byte[:size])["encoding"]
+        return encoding
+
+
+class _CharsetNormalizerDetector(_Detector):
+    name = "charset_normalizer"
+
+    def __init__(self) -> None:
+        try:
+            import charset_normalizer
+        except ImportError as error:
+            raise ImportError(
+                "The 'charset_normalizer' detector requires the charset-normalizer package."
+            ) from error
+        self.module: Any = charset_normalizer
+
+    def detect(self, byte: bytes, size: Optional[int] = None) -> Optional[str]:
+        match = self.module.from_bytes(byte[:size]).best()
+        return match.encoding if match is not None else None
+
+
+class _HeuristicDetector(_Detector):
+    """Fast detection without statistics: the charset decoding the sample to
+    the characters that look most like text, Latin-1 when none does.
+    """
+
+    name = "heuristic"
+
+    @staticmethod
+    def decode_sample(sample: bytes, charset: str) -> Optional[str]:
+        # A sample may end in the middle of a character
+        try:
+            text: str = codecs.getincrementaldecoder(charset)().decode(sample)
+        except UnicodeDecodeError:
+            return None
+        return text
+
+    def best_charset(
+        self, sample: bytes, charsets: List[Tuple[str, Pattern[str]]]
+    ) -> Optional[str]:
+        best_charset: Optional[str] = None
+        best_score = HEURISTIC_MIN_SCORE
+        for charset, pattern in charsets:
+            text = self.decode_sample(sample, charset)
+            if text is None:
+                continue
+
+            non_ascii = sum(not c.isascii() for c in text)
+            score = len(pattern.findall(text)) / max(1, non_ascii)
+            if score > best_score:
+                best_charset, best_score = charset, score
+        return best_charset
+
+    def detect(self, byte: bytes, size: Optional[int] = None) -> Optional[str]:
+        sample = byte[:size]
+
+        if sample.isascii():
+            for shift_charset in HEURISTIC_SHIFT_CHARSETS:
+                text = self.decode_sample(sample, shift_charset)
+                if text is not None and text != sample.decode("ascii"):
+                    return shift_charset
+            return "ascii"
+
+        if self.decode_sample(sample, "utf-8") is not None:
+            return "utf-8"
+
+        charset = self.best_charset(sample, HEURISTIC_MULTIBYTE_CHARSETS)
+        if charset is not None:
+            return charset
+
+        is_latin = len(ASCII_LETTER_REGEX.findall(sample)) > 2 * len(
+            NON_ASCII_REGEX.findall(sample)
+        )
+        if not is_latin:
+            charset = self.best_charset(sample, HEURISTIC_SINGLE_BYTE_CHARSETS)
+            if charset is not None:
+                return charset
+
+        if self.decode_sample(sample, HEURISTIC_LATIN_CHARSET) is not None:
+            return HEURISTIC_LATIN_CHARSET
+        return HEURISTIC_FALLBACK_CHARSET
+
+
+DETECTORS: Dict[str, Type[_Detector]] = {
+    _ChardetDetector.name: _ChardetDetector,
+    _CchardetDetector.name: _CchardetDetector,
+    _CharsetNormalizerDetector.name: _CharsetNormalizerDetector,
+    _HeuristicDetector.name: _HeuristicDetector,
+}
+
+
+def get_detector(name: str) -> _Detector:
+    """The detector backend ``name``, raising ImportError when it is not installed"""
+    if name not in DETECTORS:
+        raise ValueError(
+            f"Unknown detector: '{name}'. Only {list(DETECTORS)} are supported."
+        )
+    return DETECTORS[name]()
+
+
+def available_detectors() -> List[str]:
+    """Names of the detector backends that can be used here"""
+    available = []
+    for name in DETECTORS:
+        try:
+            get_detector(name)
+        except ImportError:
+            continue
+        available.append(name)
+    return available
@@ -0,0 +1,78 @@
+import logging
+from collections import Counter, deque
+from pathlib import Path
+from typing import Any, Deque, Dict, Optional, Union
+
+
+logger = logging.getLogger("magmail.decode")
+
+# Bytes of the payload kept in an event
+DECODE_SAMPLE_SIZE = 64
+# Events logged by a process before the next ones are only collected
+DECODE_LOG_LIMIT = 10
+
+
+class _DecodeEvent:
+    """A payload that could not be decoded: ``kind`` is ``unknown_encoding``
+    when its charset has no codec, ``undecodable`` when no charset decoded it,
+    or ``replaced`` when some of its bytes were replaced in ``replace`` mode.
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        encoding: Optional[str],
+        byte: bytes,
+        mail_index: Optional[int] = None,
+        path: Optional[Union[str, Path]] = None,
+        part: Optional[str] = None,
+    ) -> None:
+        self.kind = kind
+        self.encoding = encoding
+        self.sample = byte[:DECODE_SAMPLE_SIZE]
+        self.size = len(byte)
+        self.mail_index = mail_index
+        self.path = path
+        self.part = part
+
+    def __repr__(self) -> str:
+        return f"_DecodeEvent(kind={self.kind!r}, mail_index={self.mail_index}, path={str(self.path) if self.path is not None else None!r}, part={self.part!r}, encoding={self.encoding!r}, size={self.size}, sample={self.sample!r})"
+
+
+class _DecodeDiagnostics:
+    """Counts the decode failures of each kind and keeps the last
+    ``max_events`` of them, logging the first ones of a process.
+    """
+
+    def __init__(self, max_events: int) -> None:
+        self.counts: "Counter[str]" = Counter()
+        self.max_events = max(0, max_events)
+        self.events: Deque[_DecodeEvent] = deque(maxlen=self.max_events)
+        # Events since the last collect, sent from a worker to the parent
+        self.new_events: Deque[_DecodeEvent] = deque(maxlen=self.max_events)
+        self.logged = 0
+
+    def record(self, event: _DecodeEvent, log: bool = True) -> None:
+        self.counts[event.kind] += 1
+        self.events.append(event)
+        self.new_events.append(event)
+
+        if log:
+            self.log(event)
+
+    def log(self, event: _DecodeEvent) -> None:
+        if self.logged < DECODE_LOG_LIMIT:
+            logger.warning("Cannot decode a payload: %r", event)
+        elif self.logged == DECODE_LOG_LIMIT:
+            logger.warning("Further decode failures are not logged.")
+        self.logged += 1
+
+    def collect(self) -> Dict[str, Any]:
+        report = {"counts": dict(self.counts), "events": list(self.new_events)}
+        self.counts.clear()
+        self.new_events.clear()
+        return report
+
+    def merge(self, report: Dict[str, Any]) -> None:
+        self.counts.update(report["counts"])
+        self.events.extend(report["events"])
@@ -0,0 +1,90 @@
+import codecs
+from email.header import decode_header
+from email.message import Message
+from typing import Iterator, List, Optional
+
+from .context import _DecodeContext
+
+
+# Charset the email package gives to raw 8 bit header bytes
+UNKNOWN_8BIT = "unknown-8bit"
+
+
+def is_undeclared(charset: Optional[str]) -> bool:
+    return charset is None or charset.lower() == UNKNOWN_8BIT
+
+
+def needs_detection(byte: bytes, size: Optional[int] = None) -> bool:
+    """Whether ``byte`` is neither ASCII nor UTF-8, which are decoded without
+    detection, checking at most its first ``size`` bytes
+    """
+    if size is not None and len(byte) > size:
+        byte = byte[:size]
+        final = False
+    else:
+        final = True
+
+    if byte.isascii():
+        return False
+    try:
+        # A multibyte character cut at the end of a sample is not an error
+        codecs.getincrementaldecoder("utf-8")().decode(byte, final=final)
+    except UnicodeDecodeError:
+        return True
+    return False
+
+
+def undeclared_bytes(
+    message: Message, include_body: bool = True, size: Optional[int] = None
+) -> Iterator[bytes]:
+    """The header bytes of ``message`` of no declared charset, then those of
+    its text parts with ``include_body``, checked on their first ``size`` bytes
+    """
+    for _, value in message.items():
+        for byte, charset in decode_header(value):
+            if (
+                isinstance(byte, bytes)
+                and is_undeclared(charset)
+                and needs_detection(byte, size)
+            ):
+                yield byte
+
+    if not include_body:
+        return
+
+    for part in message.walk():
+        if part.get_content_maintype() != "text" or part.get_filename() is not None:
+            continue
+        if not is_undeclared(part.get_content_charset()):
+            continue
+
+        payload = part.get_payload(decode=True)
+        if isinstance(payload, bytes) and needs_detection(payload, size):
+            yield payload
+
+
+def infer_message_charset(
+    message: Message, context: _DecodeContext, include_body: bool = True
+) -> Optional[str]:
+    """One charset for all the undeclared bytes of ``message``, detected from
+    them together. Only the headers are read without ``include_body``, and the
+    parts are no longer read once ``detect_size`` bytes were sampled.
+    """
+    size = context.detect_size
+    samples: List[bytes] = []
+    sampled = 0
+
+    for byte in undeclared_bytes(message, include_body, size):
+        if size is not None:
+            byte = byte[: size - sampled]
+        samples.append(byte)
+        sampled += len(byte) + 1
+        if size is not None and sampled >= size:
+            break
+
+    sample = b"\n".join(samples)
+    if not sample:
+        return None
+
+    context.count("message_detected")
+    return context.detector.detect(sample, size)
@@ -0,0 +1,98 @@
+import json
+from pathlib import Path
+from collections import Counter
+from email.message import Message
+from email.utils import parseaddr
+from typing import Dict, Iterable, List, Optional, Union
+
+from magmail.utils import to_path
+from .aliases import is_single_byte
+
+
+PRIORS_TYPE = Dict[str, Dict[str, int]]
+
+
+def message_hints(message: Message) -> List[str]:
+    """Prior keys of the sender domain and the mailer of ``message``"""
+    hints = []
+
+    address = parseaddr(str(message.get("From", "")))[1]
+    if "@" in address:
+        hints.append("domain:" + address.rsplit("@", 1)[1].lower())
+
+    mailer = str(message.get("X-Mailer", "")).strip()
+    if mailer:
+        hints.append("x-mailer:" + mailer)
+
+    return hints
+
+
+class _CharsetPriors:
+    """Charsets that decoded the payloads of a sender domain, a mailer or a
+    declared charset, counted to try the most successful ones first.
+
+    The keys are hints like ``"domain:example.jp"``, ``"x-mailer:..."`` or
+    ``"charset:iso-2022-jp"``. Counts learned since the last ``collect`` are
+    kept apart, to be sent from a worker process to the parent one.
+
+    Single byte charsets decode nearly any payload, so their success proves
+    nothing: they are neither recorded nor tried, and are left to detection.
+    """
+
+    def __init__(self, priors_path: Optional[Union[str, Path]] = None) -> None:
+        self.priors_path: Optional[Path] = (
+            to_path(priors_path) if priors_path is not None else None
+        )
+        self.counts: Dict[str, "Counter[str]"] = {}
+        self.learned: Dict[str, "Counter[str]"] = {}
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def candidates(self, hints: Iterable[str]) -> List[str]:
+        """Charsets that succeeded for ``hints``, most successful first"""
+        total: "Counter[str]" = Counter()
+        for hint in hints:
+            total.update(self.counts.get(hint, {}))
+        return [
+            charset for charset, _ in total.most_common() if not is_single_byte(charset)
+        ]
+
+    def record(self, hints: Iterable[str], charset: str) -> None:
+        if is_single_byte(charset):
+            return
+
+        for hint in hints:
+            self.counts.setdefault(hint, Counter())[charset] += 1
+            self.learned.setdefault(hint, Counter())[charset] += 1
+
+    def collect(self) -> PRIORS_TYPE:
+        learned = {hint: dict(counts) for hint, counts in self.learned.items()}
+        self.learned.clear()
+        return learned
+
+    def merge(self, learned: PRIORS_TYPE) -> None:
+        for hint, counts in learned.items():
+            self.counts.setdefault(hint, Counter()).update(counts)
+
+    def load(self) -> bool:
+        if self.priors_path is None:
+            return False
+
+        try:
+            with open(self.priors_path, "r", encoding="utf-8") as priors_file:
+                self.merge(json.load(priors_file))
+        except (OSError, ValueError, AttributeError, TypeError):
+            return False
+
+        return True
+
+    def save(self) -> None:
+        if self.priors_path is None:
+            return
+
+        with open(self.priors_path, "w", encoding="utf-8") as priors_file:
+            json.dump(
+                {hint: dict(counts) for hint, counts in self.counts.items()},
+                priors_file,
+            )
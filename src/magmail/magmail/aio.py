@@ -0,0 +1,58 @@
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Iterator
+
+from magmail.mail import Mail
+
+
+# Put on the queue once the producer has yielded every mail
+_DONE = object()
+
+
+async def aiter_mails(mails: Iterator[Mail], queue_size: int) -> AsyncIterator[Mail]:
+    """Iterate ``mails`` in a thread, handing them over through a bounded queue.
+
+    The event loop is never blocked by reading or parsing, and the producer
+    waits while ``queue_size`` mails are not consumed yet.
+    """
+    loop = asyncio.get_running_loop()
+    queue: "asyncio.Queue[Any]" = asyncio.Queue(maxsize=max(1, queue_size))
+    stopped = threading.Event()
+
+    def put(item: Any) -> None:
+        asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+    def produce() -> None:
+        try:
+            for mail in mails:
+                if stopped.is_set():
+                    return
+                put(mail)
+        except Exception as error:
+            if not stopped.is_set():
+                put(error)
+            return
+        finally:
+            close = getattr(mails, "close", None)
+            if close is not None:
+                close()
+
+        if not stopped.is_set():
+            put(_DONE)
+
+    producer = loop.run_in_executor(None, produce)
+
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stopped.set()
+        # Make room for a put the producer may be blocked on, so it can stop
+        while not queue.empty():
+            queue.get_nowait()
+        await producer
@@ -0,0 +1,77 @@
+import bz2
+import gzip
+import lzma
+import tarfile
+from pathlib import Path
+from fnmatch import fnmatch
+from typing import IO, Any, Callable, Dict, Iterator, List
+
+from .mbox_index import FROM_LINE
+
+
+COMPRESSED_MBOX_OPENERS: Dict[str, Callable[..., IO[Any]]] = {
+    ".gz": gzip.open,
+    ".bz2": bz2.open,
+    ".xz": lzma.open,
+}
+
+EML_ARCHIVE_SUFFIXES = [".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz"]
+
+
+def is_compressed_mbox(path: Path) -> bool:
+    return (
+        len(path.suffixes) >= 2
+        and path.suffixes[-2] == ".mbox"
+        and path.suffix in COMPRESSED_MBOX_OPENERS
+    )
+
+
+def is_eml_archive(path: Path) -> bool:
+    return any(path.name.endswith(suffix) for suffix in EML_ARCHIVE_SUFFIXES)
+
+
+def is_archive(path: Path) -> bool:
+    return is_compressed_mbox(path) or is_eml_archive(path)
+
+
+def iter_compressed_mbox(path: Path) -> Iterator[bytes]:
+    """Yield the raw messages, "From " line included, of a compressed mbox.
+
+    The file is decompressed as a stream and split on the fly, so only one
+    message is held in memory at a time.
+    """
+    with COMPRESSED_MBOX_OPENERS[path.suffix](path, "rb") as mbox_file:
+        lines: List[bytes] = []
+
+        for line in mbox_file:
+            if line.startswith(FROM_LINE) and lines:
+                yield _strip_separator(b"".join(lines))
+                lines = []
+
+            # Anything before the first "From " line is not a message
+            if lines or line.startswith(FROM_LINE):
+                lines.append(line)
+
+        if lines:
+            yield _strip_separator(b"".join(lines))
+
+
+def _strip_separator(data: bytes) -> bytes:
+    # Like mailbox.mbox, a trailing blank line is a separator
+    return data[:-1] if data.endswith(b"\n\n") else data
+
+
+def iter_eml_archive(path: Path, patterns: List[str]) -> Iterator[bytes]:
+    """Yield the content of the files of a tar archive matching ``patterns``"""
+    with tarfile.open(path, mode="r|*") as archive:
+        for member in archive:
+            if not member.isfile():
+                continue
+            if not any(
+                fnmatch(Path(member.name).name, pattern) for pattern in patterns
+            ):
+                continue
+
+            member_file = archive.extractfile(member)
+            if member_file is not None:
+                yield member_file.read()
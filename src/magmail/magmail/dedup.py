@@ -0,0 +1,107 @@
+import hashlib
+from mailbox import mboxMessage
+from email.message import Message
+from typing import List, Optional, Set, Union
+
+from magmail.static import DUPLICATE_KEYS, FINGERPRINT_HEADERS
+
+
+# Attribute of a parsed message holding the digest of the bytes it was parsed from
+RAW_DIGEST_ATTRIBUTE = "magmail_raw_digest"
+
+
+def hash_bytes(value: Union[bytes, memoryview]) -> bytes:
+    return hashlib.blake2b(value, digest_size=16).digest()
+
+
+class _Deduplicator:
+    """Remembers a digest of every seen message to drop duplicates in O(1).
+
+    ``key`` selects what identifies a message:
+
+    - ``"raw"``: the bytes the message was parsed from, or its serialized
+      bytes when it was not parsed with ``raw_digest``
+    - ``"message_id"``: the Message-ID header, or the raw bytes when missing
+    - ``"fingerprint"``: whitespace-normalized main headers and body payloads
+
+    With ``journal``, the digests added since the last ``take_new_digests``
+    are also listed, to save them incrementally.
+    """
+
+    def __init__(self, key: str = "raw", journal: bool = False) -> None:
+        if key not in DUPLICATE_KEYS:
+            raise ValueError(
+                f"Unknown duplicate key: '{key}'. Only {DUPLICATE_KEYS} are supported."
+            )
+
+        self.key = key
+        self.digests: Set[bytes] = set()
+        self.total_dropped = 0
+        self.new_digests: Optional[List[bytes]] = [] if journal else None
+
+    def reset(self) -> None:
+        """Forget all the messages seen so far"""
+        self.digests = set()
+        self.total_dropped = 0
+        if self.new_digests is not None:
+            self.new_digests = []
+
+    def take_new_digests(self) -> List[bytes]:
+        """The digests added since the last call, with ``journal``"""
+        new_digests = self.new_digests or []
+        if self.new_digests is not None:
+            self.new_digests = []
+        return new_digests
+
+    def __len__(self) -> int:
+        return len(self.digests)
+
+    def __contains__(self, message: Union[Message, mboxMessage]) -> bool:
+        return self.digest(message) in self.digests
+
+    def digest(self, message: Union[Message, mboxMessage]) -> bytes:
+        if self.key == "message_id":
+            message_id = message.get("Message-ID")
+            if message_id is not None:
+                return self._hash(str(message_id).strip().strip("<>").encode())
+        elif self.key == "fingerprint":
+            return self._hash(self._fingerprint(message))
+
+        raw_digest: Optional[bytes] = getattr(message, RAW_DIGEST_ATTRIBUTE, None)
+        if raw_digest is not None:
+            return raw_digest
+        return self._hash(message.as_bytes())
+
+    def is_duplicate(self, message: Union[Message, mboxMessage]) -> bool:
+        """Check ``message`` and remember it, counting it when dropped"""
+        digest = self.digest(message)
+
+        if digest in self.digests:
+            self.total_dropped += 1
+            return True
+
+        self.digests.add(digest)
+        if self.new_digests is not None:
+            self.new_digests.append(digest)
+        return False
+
+    @staticmethod
+    def _hash(value: bytes) -> bytes:
+        return hash_bytes(value)
+
+    @staticmethod
+    def _fingerprint(message: Union[Message, mboxMessage]) -> bytes:
+        parts: List[bytes] = []
+
+        for name in FINGERPRINT_HEADERS:
+            value = " ".join(str(message.get(name, "")).split()).lower()
+            parts.append(value.encode("utf-8", "surrogateescape"))
+
+        for part in message.walk():
+            if part.is_multipart():
+                continue
+            payload = part.get_payload(decode=True)
+            if isinstance(payload, bytes):
+                parts.append(b" ".join(payload.split()))
+
+        return b"\0".join(parts)
@@ -0,0 +1,91 @@
+import os
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+from magmail.utils import natural_keys
+
+
+MAILDIR_SUB_DIRECTORIES = ["new", "cur"]
+MH_SEQUENCES_FILE = ".mh_sequences"
+
+
+def is_maildir(path: Path) -> bool:
+    return all((path / name).is_dir() for name in MAILDIR_SUB_DIRECTORIES)
+
+
+def is_mh(path: Path) -> bool:
+    return path.is_dir() and (path / MH_SEQUENCES_FILE).is_file()
+
+
+def is_mail_folder(path: Path) -> bool:
+    return is_maildir(path) or is_mh(path)
+
+
+def unique_name(root: Path, path: Path) -> str:
+    """Name identifying a message for its whole life in the folder.
+
+    A Maildir message moves from ``new/`` to ``cur/`` and gets its flags
+    appended after a ``:``, but keeps the part of its name before it.
+    """
+    relative_path = path.relative_to(root)
+    parent = relative_path.parent
+    if parent.name in MAILDIR_SUB_DIRECTORIES:
+        parent = parent.parent
+
+    return (parent / relative_path.name.split(":", 1)[0]).as_posix()
+
+
+def _message_directories(root: Path, recursive: bool) -> List[Path]:
+    if is_maildir(root):
+        directories = [root / name for name in MAILDIR_SUB_DIRECTORIES]
+        # Maildir++ sub-folders are the ".Folder" directories
+        sub_folders = [
+            Path(entry.path)
+            for entry in os.scandir(root)
+            if entry.is_dir() and entry.name.startswith(".")
+        ]
+    else:
+        directories = [root]
+        sub_folders = [
+            Path(entry.path)
+            for entry in os.scandir(root)
+            if entry.is_dir() and not entry.name.startswith(".")
+        ]
+
+    if recursive:
+        for sub_folder in sorted(sub_folders):
+            if is_mail_folder(sub_folder):
+                directories.extend(_message_directories(sub_folder, recursive))
+
+    return directories
+
+
+def _list_messages(directory: Path) -> List[Path]:
+    with os.scandir(directory) as entries:
+        names = [
+            entry.name
+            for entry in entries
+            if entry.is_file() and not entry.name.startswith(".")
+        ]
+
+    if directory.name not in MAILDIR_SUB_DIRECTORIES:
+        # MH messages are numbered files
+        names = [name for name in names if name.isdigit()]
+
+    return [directory / name for name in sorted(names, key=natural_keys)]
+
+
+def scan_folder(
+    root: Path, recursive: bool = False, scan_workers: int = 1
+) -> List[Tuple[str, Path]]:
+    """List the ``(unique name, path)`` of the messages of a Maildir or MH folder.
+
+    The message directories are listed concurrently by ``scan_workers`` threads.
+    """
+    directories = _message_directories(root, recursive)
+
+    with ThreadPoolExecutor(max_workers=max(1, scan_workers)) as executor:
+        listings = list(executor.map(_list_messages, directories))
+
+    return [(unique_name(root, path), path) for listing in listings for path in listing]
@@ -1,149 +1,859 @@
 import csv
 import math
-import email
-import mailbox
+import time
 from pathlib import Path
 from io import TextIOWrapper
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
 from mailbox import mboxMessage
 from email.message import Message
-from typing import Generator, Iterator, Optional, Union, List, Dict, Callable
+from typing import (
+    Any,
+    AsyncIterator,
+    Generator,
+    Iterable,
+    Iterator,
+    Optional,
+    Union,
+    List,
+    Dict,
+    Callable,
+    Tuple,
+    TypeVar,
+    overload,
+)
 
-from magmail.types import CUSTOM_FUNCTIONS_ROOT_DICT_TYPE, FILTER_CONTENTS_TYPE
+from magmail.types import (
+    CUSTOM_FUNCTIONS_ROOT_DICT_TYPE,
+    FILTER_CONTENTS_TYPE,
+    SOURCES_TYPE,
+)
 
+from .aio import aiter_mails
+from .dedup import _Deduplicator
 from .filter import _Filter
+from .mbox_index import _MboxIndex
+from .state import _Checkpoint, _IngestState, _SyncState
+from .folder import is_mail_folder, is_maildir, is_mh, scan_folder
+from .scanner import prefetch, scan_files
+from .sources import _SourceStats, expand_sources
+from .parser import is_truncated, parse_eml_bytes, parse_eml_file
+from .archive import (
+    is_archive,
+    is_compressed_mbox,
+    iter_compressed_mbox,
+    iter_eml_archive,
+)
+from .parallel import (
+    CHUNK_RESULT_TYPE,
+    STREAM_CHUNK_SIZE,
+    chunk_size,
+    ordered_map,
+    parse_bytes_chunk,
+    parse_eml_chunk,
+    parse_mbox_chunk,
+)
 from magmail.mail import Mail
+from magmail.decode import _DecodeContext, _DecodeEvent
 from magmail.utils import to_path
 from magmail.static import (
     DEFAULT_AUTO_CLEAN,
+    DEFAULT_CHECKPOINT_EVERY,
     DEFAULT_COLUMNS,
+    DEFAULT_DETECT_SIZE,
+    DEFAULT_DECODE_MODE,
+    DEFAULT_DETECTOR,
+    DEFAULT_MAX_DECODE_EVENTS,
+    DEFAULT_DUPLICATE_KEY,
+    DEFAULT_EML_PATTERNS,
+    DEFAULT_OVERSIZE,
+    DEFAULT_QUEUE_SIZE,
+    OVERSIZE_ACTIONS,
+    DECODE_MODES,
+    DEFAULT_READ_AHEAD,
+    DEFAULT_READ_WORKERS,
     CUSTOM_FUNCTIONS_DICT,
     DEFAULT_FILTER_CONTENTS_DICT,
 )
 
 
+T = TypeVar("T")
+
+UNSUPPORTED_SOURCE_MESSAGE = "Only '.eml', '.mbox', compressed '.mbox' or tar archive files, Maildir or MH folders are supported."
+
+
 class Magmail:
     def __init__(
         self,
-        mbox_path: Union[str, Path],
+        mbox_path: SOURCES_TYPE,
         auto_clean: bool = DEFAULT_AUTO_CLEAN,
         filters: Dict[str, FILTER_CONTENTS_TYPE] = DEFAULT_FILTER_CONTENTS_DICT.copy(),
         custom_functions: CUSTOM_FUNCTIONS_ROOT_DICT_TYPE = CUSTOM_FUNCTIONS_DICT.copy(),
         drop_duplicates: bool = True,
+        duplicate_key: str = DEFAULT_DUPLICATE_KEY,
+        stream: bool = False,
+        save_mbox_index: bool = True,
+        workers: int = 1,
+        lazy: bool = False,
+        headers_only: bool = False,
+        incremental: bool = False,
+        recursive: bool = False,
+        eml_patterns: List[str] = DEFAULT_EML_PATTERNS.copy(),
+        read_workers: int = DEFAULT_READ_WORKERS,
+        read_ahead: int = DEFAULT_READ_AHEAD,
+        max_message_size: Optional[int] = None,
+        max_body_chars: Optional[int] = None,
+        oversize: str = DEFAULT_OVERSIZE,
+        checkpoint: Optional[Union[str, Path]] = None,
+        checkpoint_every: int = DEFAULT_CHECKPOINT_EVERY,
+        detect_size: Optional[int] = DEFAULT_DETECT_SIZE,
+        decode_cache_size: Optional[int] = None,
+        charset_priors: Optional[Union[str, Path]] = None,
+        detector: str = DEFAULT_DETECTOR,
+        max_decode_events: int = DEFAULT_MAX_DECODE_EVENTS,
+        decode_mode: str = DEFAULT_DECODE_MODE,
+        charset_aliases: Optional[Dict[str, str]] = None,
     ):
-        self.mbox_path: Path = to_path(mbox_path)
+        if oversize not in OVERSIZE_ACTIONS:
+            raise ValueError(
+                f"Unknown oversize action: '{oversize}'. Only {OVERSIZE_ACTIONS} are supported."
+            )
+        if checkpoint is not None and not stream:
+            raise ValueError("'checkpoint' can only be used in streaming mode.")
+        if decode_mode not in DECODE_MODES:
+            raise ValueError(
+                f"Unknown decode mode: '{decode_mode}'. Only {DECODE_MODES} are supported."
+            )
+
+        # Paths or globs of mbox, eml, archive and mail folder sources
+        self.sources: List[Path] = expand_sources(mbox_path)
+        self.mbox_path: Path = self.sources[0]
         self.auto_clean: bool = auto_clean
         self.filters: _Filter = _Filter(filters)
         self.custom_functions: CUSTOM_FUNCTIONS_ROOT_DICT_TYPE = custom_functions
         self.drop_duplicates = drop_duplicates
+        self.deduplicator: _Deduplicator = _Deduplicator(
+            duplicate_key, journal=checkpoint is not None
+        )
+        self.streaming: bool = stream
+        self.save_mbox_index: bool = save_mbox_index
+        self.workers: int = workers
+        self.lazy: bool = lazy
+        self.headers_only: bool = headers_only
+        self.incremental: bool = incremental
+        self.recursive: bool = recursive
+        self.eml_patterns: List[str] = eml_patterns
+        self.read_workers: int = read_workers
+        self.read_ahead: int = read_ahead
+        self.max_message_size: Optional[int] = max_message_size
+        self.max_body_chars: Optional[int] = max_body_chars
+        self.oversize: str = oversize
+        self.total_skipped = 0
+        self.decode_context: _DecodeContext = _DecodeContext(
+            detect_size=detect_size,
+            cache_size=decode_cache_size,
+            priors_path=charset_priors,
+            detector=detector,
+            max_decode_events=max_decode_events,
+            decode_mode=decode_mode,
+            charset_aliases=charset_aliases,
+        )
+        self.checkpoint_every: int = checkpoint_every
 
         self.emails: List[Mail] = []
         self.add_mail: Callable[[Mail], None] = self.emails.append
+        self._mbox_indexes: Dict[Path, _MboxIndex] = {}
+        self._ingest_states: Dict[Path, _IngestState] = {}
+        self._sync_states: Dict[Path, _SyncState] = {}
+        self.stats: Dict[Path, _SourceStats] = {}
+        self._current_stats: Optional[_SourceStats] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Decode events of the chunk parsed by a worker, by the worker index
+        # of their mail
+        self._chunk_events: Dict[int, List[_DecodeEvent]] = {}
+
+        # Messages of the sources processed so far, and how many of them were
+        # processed before the checkpoint and must be skipped
+        self._cursor = 0
+        self._processed = 0
+        self._output: Optional[TextIOWrapper] = None
+        self.checkpoint: Optional[_Checkpoint] = None
+        if checkpoint is not None:
+            self.checkpoint = _Checkpoint(checkpoint, self.sources)
+            if self.checkpoint.load():
+                self._cursor = self._processed = self.checkpoint.cursor
+                self.deduplicator.digests = self.checkpoint.digests
+                self.deduplicator.total_dropped = self.checkpoint.total_dropped
 
-        self._parse()
+        if not self.streaming:
+            self._parse()
+
+    @classmethod
+    def stream(cls, mbox_path: SOURCES_TYPE, **kwargs: Any) -> Iterator[Mail]:
+        """Yield the mails of ``mbox_path`` one by one without keeping them in memory"""
+        return cls(mbox_path, stream=True, **kwargs).iter_mails()
+
+    @classmethod
+    def aiter(
+        cls,
+        mbox_path: SOURCES_TYPE,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        **kwargs: Any,
+    ) -> AsyncIterator[Mail]:
+        """Asynchronous ``stream``: ``async for mail in Magmail.aiter(path)``.
+
+        Reading and parsing run outside of the event loop, in a thread and in
+        the ``workers`` processes. At most ``queue_size`` parsed mails wait
+        for a slow consumer.
+        """
+        return aiter_mails(
+            cls(mbox_path, stream=True, **kwargs).iter_mails(), queue_size
+        )
 
     def __len__(self) -> int:
         return len(self.emails)
 
     def __iter__(self) -> Iterator[Mail]:
+        if self.streaming:
+            return self.iter_mails()
         return iter(self.emails)
 
+    @overload
+    def __getitem__(self, key: int) -> Mail:
+        ...
+
+    @overload
+    def __getitem__(self, key: slice) -> List[Mail]:
+        ...
+
+    def __getitem__(self, key: Union[int, slice]) -> Union[Mail, List[Mail]]:
+        """In streaming mode only the requested messages of the mbox are parsed"""
+        if not self.streaming:
+            return self.emails[key]
+
+        if not (
+            len(self.sources) == 1
+            and self.mbox_path.is_file()
+            and self.mbox_path.suffix == ".mbox"
+        ):
+            raise TypeError(
+                "Random access in streaming mode is only supported for a '.mbox' file."
+            )
+
+        mbox_index = self.get_mbox_index(self.mbox_path)
+
+        if isinstance(key, slice):
+            return [
+                self._create_mail(
+                    mbox_index.read_message(i, **self._parse_options()),
+                    self.mbox_path,
+                )
+                for i in range(*key.indices(len(mbox_index)))
+            ]
+
+        return self._create_mail(
+            mbox_index.read_message(key, **self._parse_options()),
+            self.mbox_path,
+        )
+
     def total(self) -> int:
         return self.__len__()
 
+    @property
+    def decode_counters(self) -> Dict[str, int]:
+        """Payloads decoded by each path: ``declared``, ``ascii``, ``utf-8``,
+        ``detected``, ``prior``, ``similar`` or ``message`` charset, with
+        ``message_detected`` the mails whose charset was inferred
+        """
+        return dict(self.decode_context.counters)
+
+    @property
+    def decode_errors(self) -> Dict[str, int]:
+        """Payloads that could not be decoded, by kind: ``unknown_encoding``,
+        ``undecodable``, or ``replaced`` in ``replace`` decode mode
+        """
+        return dict(self.decode_context.diagnostics.counts)
+
+    @property
+    def decode_events(self) -> List[_DecodeEvent]:
+        """The last ``max_decode_events`` decode failures, with where they come
+        from and a sample of their bytes
+        """
+        return list(self.decode_context.diagnostics.events)
+
+    @property
+    def decode_cache_stats(self) -> Optional[Dict[str, int]]:
+        """Hits and misses of the decode cache, with the entries and bytes it
+        holds in this process, or None without ``decode_cache_size``.
+        """
+        cache = self.decode_context.cache
+        return cache.stats() if cache is not None else None
+
+    @property
+    def total_duplicates(self) -> int:
+        """Number of messages dropped as duplicates so far"""
+        return self.deduplicator.total_dropped
+
     def _parse(self) -> None:
-        if self.mbox_path.suffix == ".mbox":
-            self.add_mbox(self.mbox_path)
-        elif self.mbox_path.suffix == ".eml":
-            self.add_eml(self.mbox_path)
+        with self._shared_pool():
+            for source in self.sources:
+                self.add_source(source)
+
+        self._finish_checkpoint()
+
+    def add_source(self, path: Union[str, Path]) -> None:
+        """Add the mails of an mbox, eml, archive or mail folder source"""
+        path = to_path(path)
+
+        if path.suffix == ".mbox":
+            self.add_mbox(path)
+        elif is_archive(path):
+            self.add_archive(path)
+        elif is_maildir(path):
+            self.add_maildir(path)
+        elif is_mh(path):
+            self.add_mh(path)
+        elif path.suffix == ".eml" or path.is_dir():
+            self.add_eml(path)
+        else:
+            raise TypeError(UNSUPPORTED_SOURCE_MESSAGE)
+
+    def refresh(self) -> List[Mail]:
+        """Parse only the messages added to the mboxes or folders since the last parse.
+
+        If an mbox was rewritten instead of appended to, the mails parsed so
+        far are discarded and all the sources are parsed again, returning all
+        their mails. For Maildir and MH folders, messages are recognized by
+        their unique name.
+        """
+        if not all(
+            source.suffix == ".mbox" or is_mail_folder(source)
+            for source in self.sources
+        ):
+            raise TypeError(
+                "Only '.mbox' files, Maildir or MH folders can be refreshed."
+            )
+
+        # The mails of a rewritten file cannot be told from the other mails of
+        # its source, so every source is parsed again
+        rewritten = any(state.is_rewritten() for state in self._ingest_states.values())
+        if rewritten:
+            self.emails.clear()
+            self.deduplicator.reset()
+
+        with self._shared_pool():
+            new_mails = [
+                mail
+                for source in self.sources
+                for mail in self._iter_mails(source, resume=not rewritten)
+            ]
+        if not self.streaming:
+            self.emails.extend(new_mails)
+        return new_mails
+
+    def _iter_messages(
+        self, path: Path, resume: bool = False
+    ) -> Iterator[Tuple[Union[Message, mboxMessage], Path]]:
+        if path.suffix == ".mbox":
+            return self._iter_mbox(path, resume=resume)
+        elif is_archive(path):
+            return self._iter_archive(path)
+        elif is_mail_folder(path):
+            return self._iter_folder(path, resume=resume)
+        elif path.suffix == ".eml" or path.is_dir():
+            return self._iter_eml(path)
+
+        raise TypeError(UNSUPPORTED_SOURCE_MESSAGE)
+
+    def iter_mails(self) -> Iterator[Mail]:
+        """Parse the sources lazily, yielding each mail as soon as it is created.
+
+        Each pass starts over, unless it resumes from a checkpoint or only
+        parses the messages added since the last one in ``incremental`` mode.
+        """
+        if not self.incremental and self._processed == 0:
+            self._start_pass()
+
+        with self._shared_pool():
+            for source in self.sources:
+                yield from self._iter_mails(source, resume=self.incremental)
+        self._finish_checkpoint()
+
+    def _start_pass(self) -> None:
+        """Forget the messages seen by a previous pass over the sources"""
+        self.deduplicator.reset()
+        self.total_skipped = 0
+        self.stats = {}
+        self._cursor = 0
+        if self.checkpoint is not None:
+            self.checkpoint.remove()
+
+    @contextmanager
+    def _shared_pool(self) -> Iterator[None]:
+        """Parse all the sources in one process pool, started once, then save
+        the charset priors learned from them
+        """
+        if self._executor is not None:
+            yield
+            return
+
+        try:
+            if self.workers <= 1:
+                yield
+            else:
+                with ProcessPoolExecutor(max_workers=self.workers) as self._executor:
+                    yield
+        finally:
+            self._executor = None
+            self.decode_context.save_priors()
+
+    def _advance_cursor(self) -> None:
+        """Count a message of the source, saving a checkpoint when one is due.
+
+        Called before a message is processed, when the mails of all the
+        previous ones were consumed.
+        """
+        if (
+            self.checkpoint is not None
+            and self._cursor > self.checkpoint.cursor
+            and self._cursor % max(1, self.checkpoint_every) == 0
+        ):
+            self._save_checkpoint()
+        self._cursor += 1
+
+    def _save_checkpoint(self) -> None:
+        if self.checkpoint is None:
+            return
+
+        self.checkpoint.update(
+            self._cursor,
+            self.deduplicator.total_dropped,
+            output_position=self._output.tell() if self._output is not None else None,
+        )
+        self.checkpoint.save(self.deduplicator.take_new_digests())
+        self.decode_context.save_priors()
+
+    def _finish_checkpoint(self) -> None:
+        """The whole source was processed, so there is nothing left to resume"""
+        if self.checkpoint is not None:
+            self.checkpoint.remove()
+            self._cursor = 0
+
+    def _take_processed(self, available: int) -> int:
+        """How many of the next ``available`` messages were processed before the checkpoint"""
+        taken = min(self._processed, available)
+        self._processed -= taken
+        return taken
+
+    def _skip_processed(self, items: Iterable[T]) -> Iterator[T]:
+        """Drop the leading ``items`` processed before the checkpoint"""
+        for item in items:
+            if self._take_processed(1):
+                continue
+            yield item
+
+    def _iter_mails(self, path: Path, resume: bool = False) -> Iterator[Mail]:
+        """``resume`` skips the mbox messages parsed by the previous ingestion"""
+        if path not in self.stats:
+            self.stats[path] = _SourceStats(path)
+        self._current_stats = stats = self.stats[path]
+
+        if self.workers > 1:
+            for mail in self._timed(self._iter_parallel_mails(path, resume), stats):
+                self._advance_cursor()
+                if self._is_skipped(mail.message) or (
+                    self.drop_duplicates
+                    and self.deduplicator.is_duplicate(mail.message)
+                ):
+                    self._renumber_events(mail.index, None)
+                    continue
+
+                # Workers count their own mails, so number them here in order
+                worker_index = mail.index
+                mail.index = Mail.total_instantiated
+                Mail.total_instantiated += 1
+                self._renumber_events(worker_index, mail.index)
+                yield mail
+            return
+
+        for message, message_path in self._timed(
+            self._iter_messages(path, resume=resume), stats
+        ):
+            self._advance_cursor()
+            if self._is_skipped(message):
+                continue
+            if self.drop_duplicates and self.deduplicator.is_duplicate(message):
+                continue
+
+            yield self._create_mail(message, message_path)
+
+    def _renumber_events(self, worker_index: int, index: Optional[int]) -> None:
+        """Point the decode events of a mail parsed by a worker to its index here"""
+        for event in self._chunk_events.pop(worker_index, []):
+            event.mail_index = index
+
+    def _timed(self, items: Iterator[T], stats: _SourceStats) -> Iterator[T]:
+        """Yield ``items``, adding the time taken to produce them to ``stats``"""
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            finally:
+                stats.parse_time += time.perf_counter() - started
+
+            stats.messages += 1
+            yield item
+
+    def _count_bytes(self, size: int) -> None:
+        if self._current_stats is not None:
+            self._current_stats.bytes += size
+
+    def _iter_parallel_mails(self, path: Path, resume: bool = False) -> Iterator[Mail]:
+        """Parse chunks of ``path`` in a process pool, keeping the original order.
+
+        ``custom_functions`` must be picklable (module level functions) to be
+        sent to the worker processes.
+        """
+        tasks: Iterator[Tuple[Any, ...]]
+        parse_chunk: Callable[..., CHUNK_RESULT_TYPE]
+        opened_mboxes: List[Tuple[Path, _MboxIndex, int]] = []
+        folder_files: List[Tuple[str, Path]] = []
+        if path.suffix == ".mbox":
+            self._check_path(path, ".mbox")
+            opened_mboxes = [
+                (file, *self._open_mbox(file, resume))
+                for file in self._mbox_files(path)
+            ]
+            tasks = self._mbox_chunks(opened_mboxes, path)
+            parse_chunk = parse_mbox_chunk
+        elif is_archive(path):
+            tasks = self._archive_chunks(path)
+            parse_chunk = parse_bytes_chunk
+        elif is_mail_folder(path):
+            folder_files = self._open_folder(path, resume)
+            tasks = self._file_chunks(list(self._folder_files(folder_files)), path)
+            parse_chunk = parse_eml_chunk
+        elif path.suffix == ".eml" or path.is_dir():
+            self._check_path(path, ".eml", allow_directory=True)
+            tasks = self._file_chunks(list(self._eml_files(path)), path)
+            parse_chunk = parse_eml_chunk
         else:
-            raise TypeError("Only '.eml' or '.mbox' files are supported.")
+            raise TypeError(UNSUPPORTED_SOURCE_MESSAGE)
+
+        with self._shared_pool():
+            assert self._executor is not None
+            for mails, report in ordered_map(
+                self._executor, parse_chunk, tasks, self.workers * 2
+            ):
+                self.decode_context.merge(report)
+                self._count_bytes(report.get("bytes", 0))
+                self._chunk_events = {}
+                for event in report["diagnostics"]["events"]:
+                    if event.mail_index is not None:
+                        self._chunk_events.setdefault(event.mail_index, []).append(
+                            event
+                        )
+                yield from mails
+
+        for file, mbox_index, _ in opened_mboxes:
+            self._close_mbox(file, mbox_index)
+        if folder_files:
+            self._close_folder(path, folder_files)
+
+    def _mbox_files(self, mbox_path: Path) -> List[Path]:
+        if mbox_path.is_file():
+            return [mbox_path]
+        return sorted(file for file in mbox_path.iterdir() if file.suffix == ".mbox")
+
+    def _mbox_chunks(
+        self, opened_mboxes: List[Tuple[Path, _MboxIndex, int]], path: Path
+    ) -> Iterator[Tuple[Any, ...]]:
+        for file, mbox_index, start in opened_mboxes:
+            offsets = list(mbox_index)[mbox_index.first_at(start) :]
+            size = chunk_size(len(offsets), self.workers)
+            for i in range(0, len(offsets), size):
+                yield (
+                    file,
+                    offsets[i : i + size],
+                    path,
+                    self._parse_options(),
+                    self._mail_options(),
+                )
+
+    def _eml_files(self, eml_path: Path) -> Iterator[Path]:
+        files: Iterable[Path] = [eml_path]
+        if not eml_path.is_file():
+            files = scan_files(eml_path, self.eml_patterns, recursive=self.recursive)
+
+        yield from self._skip_processed(files)
+
+    def _file_chunks(self, files: List[Path], path: Path) -> Iterator[Tuple[Any, ...]]:
+        size = chunk_size(len(files), self.workers)
+        for i in range(0, len(files), size):
+            yield files[i : i + size], path, self._parse_options(), self._mail_options()
+
+    def _archive_chunks(self, archive_path: Path) -> Iterator[Tuple[Any, ...]]:
+        is_mbox = is_compressed_mbox(archive_path)
+        datas: List[bytes] = []
+
+        for data in self._iter_archive_bytes(archive_path):
+            datas.append(data)
+            if len(datas) >= STREAM_CHUNK_SIZE:
+                yield (
+                    datas,
+                    is_mbox,
+                    archive_path,
+                    self._parse_options(),
+                    self._mail_options(),
+                )
+                datas = []
+
+        if datas:
+            yield (
+                datas,
+                is_mbox,
+                archive_path,
+                self._parse_options(),
+                self._mail_options(),
+            )
+
+    def _parse_options(self) -> Dict[str, Any]:
+        return {
+            "headers_only": self.headers_only,
+            "max_size": self.max_message_size,
+            # Hashed where the source bytes are at hand, in the workers too
+            "raw_digest": self.drop_duplicates and self.deduplicator.key == "raw",
+        }
+
+    def _is_skipped(self, message: Union[Message, mboxMessage]) -> bool:
+        """Whether ``message`` is dropped for being over ``max_message_size``"""
+        if self.oversize != "skip" or not is_truncated(message):
+            return False
+
+        self.total_skipped += 1
+        return True
+
+    def _mail_options(self) -> Dict[str, Any]:
+        return {
+            "auto_clean": self.auto_clean,
+            "filters": self.filters.filter_dict.copy(),
+            "custom_functions": self.custom_functions,
+            "lazy": self.lazy,
+            "headers_only": self.headers_only,
+            "max_body_chars": self.max_body_chars,
+            "oversize": self.oversize,
+            "decode_context": self.decode_context,
+        }
 
     def _create_mail(
         self,
         message: Union[Message, mboxMessage],
         path: Optional[Union[str, Path]] = None,
     ) -> Mail:
-        return Mail(
-            message=message,
-            path=path,
-            auto_clean=self.auto_clean,
-            filters=self.filters.filter_dict.copy(),
-            custom_functions=self.custom_functions,
-        )
+        return Mail(message=message, path=path, **self._mail_options())
 
-    def _append_mail(
-        self,
-        message: Union[Message, mboxMessage],
-        path: Optional[Union[str, Path]] = None,
-        drop_duplicates: bool = True,
-    ) -> None:
-        if drop_duplicates and self.is_mail_exist(message):
-            return
+    def is_mail_exist(self, message: Union[Message, mboxMessage]) -> bool:
+        return message in self.deduplicator
 
-        self.add_mail(self._create_mail(message, path))
+    def _check_path(
+        self, path: Path, filter_suffix: str, allow_directory: bool = False
+    ) -> None:
+        if path.suffix != filter_suffix and not (allow_directory and path.is_dir()):
+            raise ValueError(
+                f"Unknown file extension: {path.suffix}. Only '{filter_suffix}' files are supported."
+            )
 
-    def is_mail_exist(self, message: Union[Message, mboxMessage]) -> bool:
-        for mail in self.emails:
-            if mail.message.as_string() == message.as_string():
-                return True
-        return False
+        if not path.exists():
+            raise FileNotFoundError(f"File not found: {path}")
 
     def add_mbox(self, mbox_path: Union[str, Path]) -> None:
+        mbox_path = to_path(mbox_path)
+        self._check_path(mbox_path, ".mbox")
+
+        for mail in self._iter_mails(mbox_path, resume=self.incremental):
+            self.add_mail(mail)
+
+    def _iter_mbox(
+        self, mbox_path: Union[str, Path], resume: bool = False
+    ) -> Iterator[Tuple[Union[Message, mboxMessage], Path]]:
         mbox_path = to_path(mbox_path)
         filter_suffix = ".mbox"
+        self._check_path(mbox_path, filter_suffix)
 
-        if mbox_path.suffix != filter_suffix:
-            raise ValueError(
-                f"Unknown file extension: {mbox_path.suffix}. Only '{filter_suffix}' files are supported."
+        for file in self._mbox_files(mbox_path):
+            mbox_index, start = self._open_mbox(file, resume)
+            for message in mbox_index.iter_messages(start, **self._parse_options()):
+                yield message, mbox_path
+            self._close_mbox(file, mbox_index)
+
+    def get_mbox_index(
+        self, mbox_path: Union[str, Path], known_size: Optional[int] = None
+    ) -> _MboxIndex:
+        mbox_path = to_path(mbox_path)
+
+        if mbox_path not in self._mbox_indexes:
+            self._mbox_indexes[mbox_path] = _MboxIndex(
+                mbox_path, save=self.save_mbox_index, known_size=known_size
             )
+        else:
+            self._mbox_indexes[mbox_path].update(known_size)
+        return self._mbox_indexes[mbox_path]
 
-        if not mbox_path.exists():
-            raise FileNotFoundError(f"File not found: {mbox_path}")
+    def _get_ingest_state(self, mbox_path: Path) -> _IngestState:
+        if mbox_path not in self._ingest_states:
+            ingest_state = _IngestState(mbox_path)
+            if self.incremental:
+                ingest_state.load()
+            self._ingest_states[mbox_path] = ingest_state
+        return self._ingest_states[mbox_path]
 
-        if mbox_path.is_file() and mbox_path.suffix == filter_suffix:
-            mail_box = mailbox.mbox(mbox_path)
+    def _open_mbox(self, mbox_path: Path, resume: bool) -> Tuple[_MboxIndex, int]:
+        """Index ``mbox_path`` and find the offset its messages are read from"""
+        known_size = self._get_ingest_state(mbox_path).resume_offset()
+        mbox_index = self.get_mbox_index(mbox_path, known_size=known_size or None)
+        start = known_size if resume else 0
 
-            for message in mail_box:
-                self._append_mail(
-                    message, self.mbox_path, drop_duplicates=self.drop_duplicates
-                )
-        elif self.mbox_path.is_dir():
-            for file in mbox_path.iterdir():
-                if mbox_path.suffix == filter_suffix:
-                    mail_box = mailbox.mbox(file)
-                    for message in mail_box:
-                        self._append_mail(
-                            message,
-                            self.mbox_path,
-                            drop_duplicates=self.drop_duplicates,
-                        )
+        first = mbox_index.first_at(start)
+        skipped = self._take_processed(len(mbox_index) - first)
+        if skipped:
+            # Resume at the byte offset of the first message not processed
+            start = mbox_index[first + skipped - 1][1]
+        self._count_bytes(mbox_index.size - start)
+        return mbox_index, start
+
+    def _close_mbox(self, mbox_path: Path, mbox_index: _MboxIndex) -> None:
+        ingest_state = self._get_ingest_state(mbox_path)
+        ingest_state.update(mbox_index.size)
+        if self.incremental:
+            ingest_state.save()
 
     def add_eml(self, eml_path: Union[str, Path]) -> None:
         eml_path = to_path(eml_path)
-        filter_suffix = ".eml"
+        self._check_path(eml_path, ".eml", allow_directory=True)
+
+        for mail in self._iter_mails(eml_path):
+            self.add_mail(mail)
+
+    def _iter_eml(
+        self, eml_path: Union[str, Path]
+    ) -> Iterator[Tuple[Union[Message, mboxMessage], Path]]:
+        eml_path = to_path(eml_path)
+        self._check_path(eml_path, ".eml", allow_directory=True)
+
+        if eml_path.is_file():
+            for file in self._eml_files(eml_path):
+                self._count_bytes(file.stat().st_size)
+                yield parse_eml_file(file, **self._parse_options()), eml_path
+            return
+
+        for _, data, size in prefetch(
+            self._eml_files(eml_path),
+            self.read_workers,
+            self.read_ahead,
+            max_size=self.max_message_size,
+            headers_only=self.headers_only,
+        ):
+            self._count_bytes(size)
+            yield parse_eml_bytes(data, **self._parse_options()), eml_path
+
+    def add_archive(self, archive_path: Union[str, Path]) -> None:
+        """Add the mails of a compressed mbox or of a tar archive of '.eml' files"""
+        archive_path = to_path(archive_path)
 
-        if eml_path.suffix != filter_suffix:
+        if not is_archive(archive_path):
             raise ValueError(
-                f"Unknown file extension: {eml_path.suffix}. Only '{filter_suffix}' files are supported."
+                f"Unknown file extension: {''.join(archive_path.suffixes)}. Only compressed '.mbox' or tar archive files are supported."
             )
 
-        if not eml_path.exists():
-            raise FileNotFoundError(f"File not found: {eml_path}")
+        if not archive_path.exists():
+            raise FileNotFoundError(f"File not found: {archive_path}")
 
-        if eml_path.is_file() and eml_path.suffix == filter_suffix:
-            with open(eml_path, "rb") as email_file:
-                message = email.message_from_bytes(email_file.read())
-                self._append_mail(
-                    message, eml_path, drop_duplicates=self.drop_duplicates
-                )
-        elif eml_path.is_dir():
-            for file in eml_path.iterdir():
-                if file.suffix == filter_suffix:
-                    with open(file, "rb") as email_file:
-                        message = email.message_from_bytes(email_file.read())
-                        self._append_mail(
-                            message, eml_path, drop_duplicates=self.drop_duplicates
-                        )
+        for mail in self._iter_mails(archive_path):
+            self.add_mail(mail)
+
+    def _iter_archive_bytes(self, archive_path: Path) -> Iterator[bytes]:
+        self._count_bytes(archive_path.stat().st_size)
+        if is_compressed_mbox(archive_path):
+            return self._skip_processed(iter_compressed_mbox(archive_path))
+        return self._skip_processed(iter_eml_archive(archive_path, self.eml_patterns))
+
+    def _iter_archive(
+        self, archive_path: Path
+    ) -> Iterator[Tuple[Union[Message, mboxMessage], Path]]:
+        is_mbox = is_compressed_mbox(archive_path)
+
+        for data in self._iter_archive_bytes(archive_path):
+            message: Union[Message, mboxMessage]
+            if is_mbox:
+                message = _MboxIndex.to_message(data, **self._parse_options())
+            else:
+                message = parse_eml_bytes(data, **self._parse_options())
+            yield message, archive_path
+
+    def add_maildir(self, maildir_path: Union[str, Path]) -> None:
+        maildir_path = to_path(maildir_path)
+
+        if not is_maildir(maildir_path):
+            raise ValueError(f"Not a Maildir folder: {maildir_path}")
+
+        for mail in self._iter_mails(maildir_path, resume=self.incremental):
+            self.add_mail(mail)
+
+    def add_mh(self, mh_path: Union[str, Path]) -> None:
+        mh_path = to_path(mh_path)
+
+        if not is_mh(mh_path):
+            raise ValueError(f"Not an MH folder: {mh_path}")
+
+        for mail in self._iter_mails(mh_path, resume=self.incremental):
+            self.add_mail(mail)
+
+    def _get_sync_state(self, folder_path: Path) -> _SyncState:
+        if folder_path not in self._sync_states:
+            sync_state = _SyncState(folder_path)
+            if self.incremental:
+                sync_state.load()
+            self._sync_states[folder_path] = sync_state
+        return self._sync_states[folder_path]
+
+    def _open_folder(self, folder_path: Path, resume: bool) -> List[Tuple[str, Path]]:
+        """List the messages of a Maildir or MH folder, skipping the synced ones"""
+        files = scan_folder(
+            folder_path, recursive=self.recursive, scan_workers=self.read_workers
+        )
+        if not resume:
+            return files
+
+        sync_state = self._get_sync_state(folder_path)
+        return [(name, file) for name, file in files if name not in sync_state]
+
+    def _folder_files(self, files: List[Tuple[str, Path]]) -> Iterator[Path]:
+        return self._skip_processed(file for _, file in files)
+
+    def _close_folder(self, folder_path: Path, files: List[Tuple[str, Path]]) -> None:
+        sync_state = self._get_sync_state(folder_path)
+        sync_state.update(name for name, _ in files)
+        if self.incremental:
+            sync_state.save()
+
+    def _iter_folder(
+        self, folder_path: Path, resume: bool = False
+    ) -> Iterator[Tuple[Union[Message, mboxMessage], Path]]:
+        files = self._open_folder(folder_path, resume)
+
+        for _, data, size in prefetch(
+            self._folder_files(files),
+            self.read_workers,
+            self.read_ahead,
+            max_size=self.max_message_size,
+            headers_only=self.headers_only,
+        ):
+            self._count_bytes(size)
+            yield parse_eml_bytes(data, **self._parse_options()), folder_path
+
+        self._close_folder(folder_path, files)
 
     def split_emails(self, n: int) -> Generator[List[Mail], None, None]:
         for idx in range(0, self.total(), n):
@@ -158,7 +868,14 @@ class Magmail:
         extends_columns: List[str] = [],
         slice_files: int = 1,
     ) -> None:
-        """Export all mails of this class to csv"""
+        """Export all mails of this class to csv.
+
+        In streaming mode with a checkpoint, an interrupted export is resumed
+        where the checkpoint was saved.
+        """
+        if self.streaming and slice_files > 1:
+            raise ValueError("'slice_files' cannot be used in streaming mode.")
+
         files: List[TextIOWrapper] = []
         files_path: List[Path] = []
         if extends_columns:
@@ -189,16 +906,40 @@ class Magmail:
             csv_path = csv_path.with_suffix(".csv")
             files_path.append(csv_path)
 
+        output_position: Optional[int] = None
+        if self.streaming and self.checkpoint is not None and files_path[0].exists():
+            output_position = self.checkpoint.output_position
+
         for path in files_path:
-            files.append(open(path, "w", encoding=encoding, newline=""))
+            if output_position is None:
+                files.append(open(path, "w", encoding=encoding, newline=""))
+            else:
+                file = open(path, "r+", encoding=encoding, newline="")
+                file.seek(output_position)
+                file.truncate()
+                files.append(file)
+
+        splitted_emails_list: Iterator[Iterable[Mail]]
+        if self.streaming:
+            self._output = files[0]
+            splitted_emails_list = iter([self.iter_mails()])
+        else:
+            splitted_emails_list = self.split_emails(
+                math.ceil(self.total() / slice_files)
+            )
 
         file_index = 0
-        for splitted_emails in self.split_emails(math.ceil(self.total() / slice_files)):
+        for splitted_emails in splitted_emails_list:
             writer = csv.writer(files[file_index], quotechar='"')
-            writer.writerow(columns)
+            if output_position is None:
+                writer.writerow(columns)
             for mail in splitted_emails:
                 rows = []
                 for row in columns:
                     rows.append(getattr(mail, row, None))
                 writer.writerow(rows)
             file_index += 1
+
+        self._output = None
+        for file in files:
+            file.close()
@@ -0,0 +1,263 @@
+import mmap
+import struct
+from array import array
+from pathlib import Path
+from mailbox import mboxMessage
+from typing import Iterator, Optional, Tuple, Union
+
+from magmail.utils import to_path
+from .parser import (
+    BUFFER_TYPE,
+    MessageTruncatedDefect,
+    decode_message,
+    find_header_end,
+    set_raw_digest,
+    truncated_end,
+)
+
+
+MBOX_INDEX_SUFFIX = ".idx"
+MBOX_INDEX_MAGIC = b"MAGMIDX1"
+# magic, mbox size, mbox mtime (ns), number of messages
+MBOX_INDEX_HEADER = struct.Struct("<8sQQQ")
+FROM_LINE = b"From "
+
+
+class _MboxIndex:
+    """(start, end) byte offsets of every message of an mbox file.
+
+    The offsets are found with an mmap scan for the ``From`` separators and
+    saved in a sidecar file, which is reused as long as the size and mtime of
+    the mbox file are unchanged.
+    """
+
+    def __init__(
+        self,
+        mbox_path: Union[str, Path],
+        index_path: Optional[Union[str, Path]] = None,
+        save: bool = True,
+        known_size: Optional[int] = None,
+    ) -> None:
+        self.mbox_path: Path = to_path(mbox_path)
+        self.index_path: Path = (
+            to_path(index_path)
+            if index_path is not None
+            else self.mbox_path.with_name(self.mbox_path.name + MBOX_INDEX_SUFFIX)
+        )
+        self.save_index = save
+        # Flattened (start, end) pairs
+        self.offsets: array = array("Q")  # type: ignore[type-arg]
+        # Size and mtime of the mbox file when it was scanned
+        self.size = 0
+        self.mtime = 0
+
+        self.load()
+        self.update(known_size)
+
+    def __len__(self) -> int:
+        return len(self.offsets) // 2
+
+    def __getitem__(self, index: int) -> Tuple[int, int]:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("mbox index out of range")
+        return self.offsets[index * 2], self.offsets[index * 2 + 1]
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def _stat(self) -> Tuple[int, int]:
+        stat = self.mbox_path.stat()
+        return stat.st_size, stat.st_mtime_ns
+
+    def first_at(self, offset: int) -> int:
+        """Position of the first message starting at or after ``offset``"""
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self.offsets[middle * 2] < offset:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def update(self, known_size: Optional[int] = None) -> None:
+        """Bring the offsets up to date with the mbox file.
+
+        ``known_size`` is a previous size of the file whose content is known
+        to be unchanged (only appended to). If the offsets were scanned at
+        that size, only the appended bytes are scanned.
+        """
+        size, mtime = self._stat()
+        if (size, mtime) == (self.size, self.mtime):
+            return
+
+        if known_size is not None and known_size == self.size and size >= known_size:
+            self.scan(start=known_size)
+        else:
+            self.scan()
+
+        if self.save_index:
+            self.save()
+
+    def scan(self, start: int = 0) -> None:
+        """Find the messages starting at or after ``start``.
+
+        Offsets of the messages before ``start`` are kept as they are.
+        """
+        if start == 0:
+            self.offsets = array("Q")
+        size, mtime = self._stat()
+        self.size, self.mtime = size, mtime
+
+        if size <= start:
+            return
+
+        with open(self.mbox_path, "rb") as mbox_file:
+            with mmap.mmap(mbox_file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                starts = (
+                    [start] if mm[start : start + len(FROM_LINE)] == FROM_LINE else []
+                )
+                position = mm.find(b"\n" + FROM_LINE, start, size)
+                while position != -1:
+                    starts.append(position + 1)
+                    position = mm.find(b"\n" + FROM_LINE, position + 1, size)
+
+                for i, start in enumerate(starts):
+                    end = starts[i + 1] if i + 1 < len(starts) else size
+                    # Like mailbox.mbox, a trailing blank line is a separator
+                    if mm[end - 2 : end] == b"\n\n":
+                        end -= 1
+                    self.offsets.extend((start, end))
+
+    def load(self) -> bool:
+        try:
+            with open(self.index_path, "rb") as index_file:
+                header = index_file.read(MBOX_INDEX_HEADER.size)
+                if len(header) != MBOX_INDEX_HEADER.size:
+                    return False
+
+                magic, size, mtime, total = MBOX_INDEX_HEADER.unpack(header)
+                if magic != MBOX_INDEX_MAGIC:
+                    return False
+
+                offsets = array("Q")
+                offsets.frombytes(index_file.read())
+        except (OSError, ValueError):
+            return False
+
+        if len(offsets) != total * 2:
+            return False
+
+        self.offsets = offsets
+        self.size, self.mtime = size, mtime
+        return True
+
+    def save(self) -> None:
+        try:
+            with open(self.index_path, "wb") as index_file:
+                index_file.write(
+                    MBOX_INDEX_HEADER.pack(
+                        MBOX_INDEX_MAGIC, self.size, self.mtime, len(self)
+                    )
+                )
+                index_file.write(self.offsets.tobytes())
+        except OSError:
+            # A read-only mailbox directory only costs a rescan next time
+            pass
+
+    def read_message(
+        self,
+        index: int,
+        headers_only: bool = False,
+        max_size: Optional[int] = None,
+        raw_digest: bool = False,
+    ) -> mboxMessage:
+        start, end = self[index]
+        with open(self.mbox_path, "rb") as mbox_file:
+            with mmap.mmap(mbox_file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return self.parse_message(
+                    mm,
+                    start,
+                    end,
+                    headers_only=headers_only,
+                    max_size=max_size,
+                    raw_digest=raw_digest,
+                )
+
+    def iter_messages(
+        self,
+        offset: int = 0,
+        headers_only: bool = False,
+        max_size: Optional[int] = None,
+        raw_digest: bool = False,
+    ) -> Iterator[mboxMessage]:
+        """Yield the messages starting at or after ``offset``"""
+        first = self.first_at(offset)
+        if first == len(self):
+            return
+
+        with open(self.mbox_path, "rb") as mbox_file:
+            with mmap.mmap(mbox_file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for i in range(first, len(self)):
+                    start, end = self[i]
+                    yield self.parse_message(
+                        mm,
+                        start,
+                        end,
+                        headers_only=headers_only,
+                        max_size=max_size,
+                        raw_digest=raw_digest,
+                    )
+
+    @staticmethod
+    def parse_message(
+        buffer: BUFFER_TYPE,
+        start: int,
+        end: int,
+        headers_only: bool = False,
+        max_size: Optional[int] = None,
+        raw_digest: bool = False,
+    ) -> mboxMessage:
+        """Parse the message at ``buffer[start:end]``, "From " line included.
+
+        With ``headers_only``, decoding stops at the end of the headers and
+        the pages of the body are never read. Past ``max_size`` bytes, the
+        message is cut like in parse_eml_buffer. With ``raw_digest``, the
+        digest of its bytes after the "From " line is kept on it.
+        """
+        newline = buffer.find(b"\n", start, end)
+        if newline == -1:
+            newline = end
+        body_start = min(newline + 1, end)
+
+        if headers_only:
+            end = find_header_end(buffer, body_start, end)
+
+        truncated_at = truncated_end(buffer, body_start, end, max_size)
+        message = mboxMessage(decode_message(buffer, body_start, truncated_at))
+        if truncated_at < end:
+            message.defects.append(MessageTruncatedDefect())
+        unixfrom = decode_message(buffer, start + len(FROM_LINE), newline)
+        message.set_from(unixfrom.rstrip("\r"))
+        if raw_digest:
+            set_raw_digest(message, buffer, body_start, truncated_at)
+        return message
+
+    @staticmethod
+    def to_message(
+        data: bytes,
+        headers_only: bool = False,
+        max_size: Optional[int] = None,
+        raw_digest: bool = False,
+    ) -> mboxMessage:
+        return _MboxIndex.parse_message(
+            data,
+            0,
+            len(data),
+            headers_only=headers_only,
+            max_size=max_size,
+            raw_digest=raw_digest,
+        )
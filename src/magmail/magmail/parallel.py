@@ -0,0 +1,121 @@
+import os
+import mmap
+from pathlib import Path
+from collections import deque
+from concurrent.futures import Executor, Future
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Tuple,
+    TypeVar,
+)
+
+from magmail.mail import Mail
+from .mbox_index import _MboxIndex
+from .parser import parse_eml_bytes, parse_eml_file
+
+
+MAX_CHUNK_SIZE = 512
+
+# Chunk size for streamed sources, whose total is not known in advance
+STREAM_CHUNK_SIZE = 64
+
+T = TypeVar("T")
+
+# The mails of a chunk, and what was recorded by the decode context meanwhile,
+# with the "bytes" of the files read in the worker
+CHUNK_RESULT_TYPE = Tuple[List[Mail], Dict[str, Any]]
+
+
+def chunk_size(total: int, workers: int) -> int:
+    """A few chunks per worker keeps them busy without holding too many mails"""
+    return max(1, min(MAX_CHUNK_SIZE, -(-total // (workers * 4))))
+
+
+def parse_mbox_chunk(
+    mbox_path: Path,
+    offsets: List[Tuple[int, int]],
+    path: Path,
+    parse_options: Dict[str, Any],
+    mail_options: Dict[str, Any],
+) -> CHUNK_RESULT_TYPE:
+    mails: List[Mail] = []
+    # Drop what a forked worker inherited from the parent process
+    mail_options["decode_context"].collect()
+
+    with open(mbox_path, "rb") as mbox_file:
+        with mmap.mmap(mbox_file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for start, end in offsets:
+                message = _MboxIndex.parse_message(mm, start, end, **parse_options)
+                mails.append(Mail(message=message, path=path, **mail_options))
+
+    return mails, mail_options["decode_context"].collect()
+
+
+def parse_eml_chunk(
+    eml_paths: List[Path],
+    path: Path,
+    parse_options: Dict[str, Any],
+    mail_options: Dict[str, Any],
+) -> CHUNK_RESULT_TYPE:
+    mails: List[Mail] = []
+    mail_options["decode_context"].collect()
+
+    total_bytes = 0
+    for eml_path in eml_paths:
+        total_bytes += os.path.getsize(eml_path)
+        message = parse_eml_file(eml_path, **parse_options)
+        mails.append(Mail(message=message, path=path, **mail_options))
+
+    report = mail_options["decode_context"].collect()
+    report["bytes"] = total_bytes
+    return mails, report
+
+
+def parse_bytes_chunk(
+    datas: List[bytes],
+    is_mbox: bool,
+    path: Path,
+    parse_options: Dict[str, Any],
+    mail_options: Dict[str, Any],
+) -> CHUNK_RESULT_TYPE:
+    mails: List[Mail] = []
+    mail_options["decode_context"].collect()
+
+    for data in datas:
+        message = (
+            _MboxIndex.to_message(data, **parse_options)
+            if is_mbox
+            else parse_eml_bytes(data, **parse_options)
+        )
+        mails.append(Mail(message=message, path=path, **mail_options))
+
+    return mails, mail_options["decode_context"].collect()
+
+
+def ordered_map(
+    executor: Executor,
+    function: Callable[..., T],
+    tasks: Iterable[Tuple[Any, ...]],
+    window: int,
+) -> Iterator[T]:
+    """Yield the results of ``tasks`` in submission order.
+
+    At most ``window`` chunks are in flight, so a slow consumer does not make
+    parsed mails pile up in memory.
+    """
+    pending: Deque["Future[T]"] = deque()
+
+    for task in tasks:
+        pending.append(executor.submit(function, *task))
+
+        if len(pending) >= window:
+            yield pending.popleft().result()
+
+    while pending:
+        yield pending.popleft().result()
@@ -0,0 +1,140 @@
+import os
+import mmap
+import email
+from pathlib import Path
+from email.message import Message
+from email.errors import MessageDefect
+from mailbox import mboxMessage
+from typing import Optional, Union
+
+from .dedup import RAW_DIGEST_ATTRIBUTE, hash_bytes
+
+
+BUFFER_TYPE = Union[bytes, mmap.mmap]
+
+
+class MessageTruncatedDefect(MessageDefect):
+    """The message was larger than ``max_size`` and only its beginning was parsed"""
+
+
+def find_header_end(buffer: BUFFER_TYPE, start: int, end: int) -> int:
+    """Offset of the blank line ending the headers of ``buffer[start:end]``"""
+    if buffer[start : start + 1] == b"\n" or buffer[start : start + 2] == b"\r\n":
+        return start
+
+    separators = [
+        position
+        for position in (
+            buffer.find(b"\n\n", start, end),
+            buffer.find(b"\n\r\n", start, end),
+        )
+        if position != -1
+    ]
+    return min(separators) + 1 if separators else end
+
+
+def truncated_end(
+    buffer: BUFFER_TYPE, start: int, end: int, max_size: Optional[int]
+) -> int:
+    """End of ``buffer[start:end]`` cut to ``max_size`` bytes.
+
+    The headers are always kept whole, even when they are longer than
+    ``max_size``.
+    """
+    if max_size is None or end - start <= max_size:
+        return end
+    return max(start + max_size, find_header_end(buffer, start, end))
+
+
+def is_truncated(message: Union[Message, mboxMessage]) -> bool:
+    # Compared by name, so the defect is recognized even when this module was
+    # also imported under another package name
+    return any(
+        type(defect).__name__ == MessageTruncatedDefect.__name__
+        for defect in message.defects
+    )
+
+
+def decode_message(buffer: BUFFER_TYPE, start: int, end: int) -> str:
+    """Decode ``buffer[start:end]`` like email.message_from_bytes does.
+
+    The text is decoded from a memoryview, so the buffer is not sliced into
+    bytes first.
+    """
+    with memoryview(buffer) as view:
+        with view[start:end] as message_view:
+            return str(message_view, "ascii", "surrogateescape")
+
+
+def set_raw_digest(message: Message, buffer: BUFFER_TYPE, start: int, end: int) -> None:
+    """Keep on ``message`` the digest of ``buffer[start:end]`` it was parsed
+    from, so the ``raw`` duplicate key does not serialize it again
+    """
+    with memoryview(buffer) as view:
+        with view[start:end] as message_view:
+            setattr(message, RAW_DIGEST_ATTRIBUTE, hash_bytes(message_view))
+
+
+def parse_eml_buffer(
+    buffer: BUFFER_TYPE,
+    start: int,
+    end: int,
+    headers_only: bool = False,
+    max_size: Optional[int] = None,
+    raw_digest: bool = False,
+) -> Message:
+    """Parse the message at ``buffer[start:end]``.
+
+    With ``headers_only``, the body is neither decoded nor parsed. A message
+    longer than ``max_size`` bytes is cut and gets a MessageTruncatedDefect.
+    With ``raw_digest``, the digest of the parsed bytes is kept on it.
+    """
+    if headers_only:
+        end = find_header_end(buffer, start, end)
+
+    truncated_at = truncated_end(buffer, start, end, max_size)
+    message = email.message_from_string(decode_message(buffer, start, truncated_at))
+    if truncated_at < end:
+        message.defects.append(MessageTruncatedDefect())
+    if raw_digest:
+        set_raw_digest(message, buffer, start, truncated_at)
+    return message
+
+
+def parse_eml_bytes(
+    data: bytes,
+    headers_only: bool = False,
+    max_size: Optional[int] = None,
+    raw_digest: bool = False,
+) -> Message:
+    return parse_eml_buffer(
+        data,
+        0,
+        len(data),
+        headers_only=headers_only,
+        max_size=max_size,
+        raw_digest=raw_digest,
+    )
+
+
+def parse_eml_file(
+    path: Path,
+    headers_only: bool = False,
+    max_size: Optional[int] = None,
+    raw_digest: bool = False,
+) -> Message:
+    """Parse an .eml file from its mmap, without reading it to bytes"""
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        if size == 0:
+            return parse_eml_bytes(b"", raw_digest=raw_digest)
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return parse_eml_buffer(
+                mm,
+                0,
+                size,
+                headers_only=headers_only,
+                max_size=max_size,
+                raw_digest=raw_digest,
+            )
@@ -0,0 +1,97 @@
+import os
+from pathlib import Path
+from fnmatch import fnmatch
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Deque, Iterable, Iterator, List, Optional, Tuple
+
+from magmail.utils import natural_keys
+from .parser import find_header_end
+
+
+# Bytes read at a time past the size limit, until the end of the headers
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def scan_files(
+    root: Path, patterns: List[str], recursive: bool = False
+) -> Iterator[Path]:
+    """Yield the files under ``root`` whose name matches one of ``patterns``,
+    in natural order within each directory
+    """
+    directories = [root]
+
+    while directories:
+        with os.scandir(directories.pop()) as iterator:
+            entries = sorted(iterator, key=lambda entry: natural_keys(entry.name))
+
+        sub_directories = []
+        for entry in entries:
+            if entry.is_dir():
+                if recursive:
+                    sub_directories.append(Path(entry.path))
+            elif any(fnmatch(entry.name, pattern) for pattern in patterns):
+                yield Path(entry.path)
+
+        # Reversed so the directories are walked in the order they were listed
+        directories.extend(reversed(sub_directories))
+
+
+def read_file(
+    path: Path, max_size: Optional[int] = None, headers_only: bool = False
+) -> Tuple[bytes, int]:
+    """Return the content of ``path`` and its size on disk.
+
+    With ``max_size`` or ``headers_only``, only what parse_eml_bytes keeps is
+    read: the headers whole, and one byte past the limit to tell that the
+    message was cut.
+    """
+    limit = 0 if headers_only else max_size
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        if limit is None:
+            return file.read(), size
+
+        data = file.read(limit + 1)
+        while len(data) > limit and find_header_end(data, 0, len(data)) == len(data):
+            chunk = file.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            data += chunk
+        return data, size
+
+
+def prefetch(
+    paths: Iterable[Path],
+    read_workers: int,
+    read_ahead: int,
+    max_size: Optional[int] = None,
+    headers_only: bool = False,
+) -> Iterator[Tuple[Path, bytes, int]]:
+    """Yield ``(path, content, size)`` of ``paths`` in order, reading ahead in
+    threads.
+
+    At most ``read_ahead`` files are read but not yet consumed, which hides
+    the I/O latency while keeping memory bounded. Files are read as far as
+    ``max_size`` and ``headers_only`` allow, like read_file.
+    """
+    if read_workers <= 1:
+        for path in paths:
+            yield (path, *read_file(path, max_size, headers_only))
+        return
+
+    pending: Deque[Tuple[Path, "Future[Tuple[bytes, int]]"]] = deque()
+
+    with ThreadPoolExecutor(max_workers=read_workers) as executor:
+        for path in paths:
+            pending.append(
+                (path, executor.submit(read_file, path, max_size, headers_only))
+            )
+
+            if len(pending) >= max(1, read_ahead):
+                path, future = pending.popleft()
+                yield (path, *future.result())
+
+        while pending:
+            path, future = pending.popleft()
+            yield (path, *future.result())
@@ -0,0 +1,72 @@
+import glob
+from pathlib import Path
+from typing import Dict, List, Union
+
+from magmail.types import SOURCES_TYPE
+from magmail.utils import natural_keys, to_path
+from .mbox_index import MBOX_INDEX_SUFFIX
+from .state import INGEST_STATE_SUFFIX
+
+
+GLOB_CHARACTERS = "*?["
+
+# Files written next to the sources, never matched by a glob
+SIDECAR_SUFFIXES = [MBOX_INDEX_SUFFIX, INGEST_STATE_SUFFIX]
+
+
+def is_glob(source: Union[str, Path]) -> bool:
+    """Whether ``source`` is a str glob, and not an existing path like ``mail[1].eml``"""
+    return (
+        isinstance(source, str)
+        and any(c in source for c in GLOB_CHARACTERS)
+        and not Path(source).exists()
+    )
+
+
+def expand_sources(sources: SOURCES_TYPE) -> List[Path]:
+    """Paths of ``sources``, a path, a glob or a list of them, in order.
+
+    The matches of a glob are sorted in human order, and a path given twice is
+    only kept the first time.
+    """
+    if isinstance(sources, (str, Path)):
+        sources = [sources]
+
+    paths: Dict[Path, None] = {}
+    for source in sources:
+        if not is_glob(source):
+            paths[to_path(source)] = None
+            continue
+
+        matches = [
+            match
+            for match in glob.glob(str(source), recursive=True)
+            if not any(match.endswith(suffix) for suffix in SIDECAR_SUFFIXES)
+        ]
+        if not matches:
+            raise FileNotFoundError(f"No file matches: {source}")
+
+        for match in sorted(matches, key=natural_keys):
+            paths[Path(match)] = None
+
+    if not paths:
+        raise ValueError("At least one source is required.")
+
+    return list(paths)
+
+
+class _SourceStats:
+    """Counters of the ingestion of one source.
+
+    ``parse_time`` is the time spent reading and parsing its messages, not
+    counting the time the mails were held by the consumer.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.messages = 0
+        self.bytes = 0
+        self.parse_time = 0.0
+
+    def __repr__(self) -> str:
+        return f"_SourceStats(path={str(self.path)!r}, messages={self.messages}, bytes={self.bytes}, parse_time={self.parse_time:.3f})"
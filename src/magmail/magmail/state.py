@@ -0,0 +1,209 @@
+import os
+import json
+import hashlib
+from pathlib import Path
+from typing import Iterable, List, Optional, Set, Union
+
+from magmail.utils import to_path
+
+
+INGEST_STATE_SUFFIX = ".state"
+# Log the digests of a checkpoint are appended to, next to it
+CHECKPOINT_DIGESTS_SUFFIX = ".digests"
+# Bytes before the last processed offset used to detect a rewritten file
+TAIL_SIZE = 4096
+# Size of the digests of _Deduplicator
+DIGEST_SIZE = 16
+
+
+class _IngestState:
+    """Where the last ingestion of an append-only mbox file stopped.
+
+    The processed offset is stored with a hash of the bytes just before it, so
+    a file that was rewritten instead of appended to is detected.
+    """
+
+    def __init__(
+        self,
+        mbox_path: Union[str, Path],
+        state_path: Optional[Union[str, Path]] = None,
+    ) -> None:
+        self.mbox_path: Path = to_path(mbox_path)
+        self.state_path: Path = (
+            to_path(state_path)
+            if state_path is not None
+            else self.mbox_path.with_name(self.mbox_path.name + INGEST_STATE_SUFFIX)
+        )
+        self.offset = 0
+        self.tail_hash = ""
+
+    def _tail_hash(self, offset: int) -> str:
+        with open(self.mbox_path, "rb") as mbox_file:
+            mbox_file.seek(max(0, offset - TAIL_SIZE))
+            return hashlib.sha1(mbox_file.read(min(offset, TAIL_SIZE))).hexdigest()
+
+    def resume_offset(self) -> int:
+        """Offset new messages start at, or 0 when the file must be fully read"""
+        if self.offset == 0 or not self.mbox_path.is_file():
+            return 0
+
+        if self.mbox_path.stat().st_size < self.offset:
+            return 0
+
+        if self._tail_hash(self.offset) != self.tail_hash:
+            return 0
+
+        return self.offset
+
+    def is_rewritten(self) -> bool:
+        return self.offset > 0 and self.resume_offset() == 0
+
+    def update(self, offset: int) -> None:
+        self.offset = offset
+        self.tail_hash = self._tail_hash(offset)
+
+    def load(self) -> bool:
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as state_file:
+                state = json.load(state_file)
+            self.offset = int(state["offset"])
+            self.tail_hash = str(state["tail_hash"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+
+        return True
+
+    def save(self) -> None:
+        with open(self.state_path, "w", encoding="utf-8") as state_file:
+            json.dump({"offset": self.offset, "tail_hash": self.tail_hash}, state_file)
+
+
+class _SyncState:
+    """Unique names of the messages of a Maildir or MH folder already ingested"""
+
+    def __init__(
+        self,
+        folder_path: Union[str, Path],
+        state_path: Optional[Union[str, Path]] = None,
+    ) -> None:
+        self.folder_path: Path = to_path(folder_path)
+        self.state_path: Path = (
+            to_path(state_path)
+            if state_path is not None
+            else self.folder_path.with_name(self.folder_path.name + INGEST_STATE_SUFFIX)
+        )
+        self.names: Set[str] = set()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.names
+
+    def update(self, names: Iterable[str]) -> None:
+        self.names.update(names)
+
+    def load(self) -> bool:
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as state_file:
+                self.names = set(json.load(state_file)["names"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+
+        return True
+
+    def save(self) -> None:
+        with open(self.state_path, "w", encoding="utf-8") as state_file:
+            json.dump({"names": sorted(self.names)}, state_file)
+
+
+class _Checkpoint:
+    """Progress of a long ingestion, saved periodically to resume it after a crash.
+
+    ``cursor`` counts the messages of ``sources`` already processed, and
+    ``output_position`` is where the export of their mails stopped. The
+    digests of the messages seen are appended to a log file, only the new
+    ones at each save, and the checkpoint records how many of them it covers.
+    """
+
+    def __init__(
+        self, checkpoint_path: Union[str, Path], sources: Iterable[Path]
+    ) -> None:
+        self.checkpoint_path: Path = to_path(checkpoint_path)
+        self.digests_path: Path = self.checkpoint_path.with_name(
+            self.checkpoint_path.name + CHECKPOINT_DIGESTS_SUFFIX
+        )
+        self.sources: List[str] = [str(source) for source in sources]
+        self.cursor = 0
+        self.digests: Set[bytes] = set()
+        self.total_digests = 0
+        self.total_dropped = 0
+        self.output_position: Optional[int] = None
+
+    def update(
+        self,
+        cursor: int,
+        total_dropped: int,
+        output_position: Optional[int] = None,
+    ) -> None:
+        self.cursor = cursor
+        self.total_dropped = total_dropped
+        self.output_position = output_position
+
+    def load(self) -> bool:
+        """Load the checkpoint, unless it is missing or was saved for other sources"""
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as checkpoint_file:
+                state = json.load(checkpoint_file)
+            if state["sources"] != self.sources:
+                return False
+
+            total_digests = int(state["total_digests"])
+            with open(self.digests_path, "rb") as digests_file:
+                # Digests appended after the last checkpoint are ignored
+                digests = digests_file.read(total_digests * DIGEST_SIZE)
+            if len(digests) != total_digests * DIGEST_SIZE:
+                return False
+
+            self.cursor = int(state["cursor"])
+            self.digests = {
+                digests[i : i + DIGEST_SIZE]
+                for i in range(0, len(digests), DIGEST_SIZE)
+            }
+            self.total_digests = total_digests
+            self.total_dropped = int(state["total_dropped"])
+            self.output_position = state["output_position"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+
+        return True
+
+    def save(self, new_digests: List[bytes]) -> None:
+        """Save the checkpoint, appending the digests seen since the last one"""
+        with open(self.digests_path, "ab") as digests_file:
+            # Drop what a crash while saving may have left after the last one
+            digests_file.truncate(self.total_digests * DIGEST_SIZE)
+            digests_file.write(b"".join(new_digests))
+        self.total_digests += len(new_digests)
+
+        # Written aside then renamed, so a crash while saving keeps the last one
+        temporary_path = self.checkpoint_path.with_name(
+            self.checkpoint_path.name + ".tmp"
+        )
+        with open(temporary_path, "w", encoding="utf-8") as checkpoint_file:
+            json.dump(
+                {
+                    "sources": self.sources,
+                    "cursor": self.cursor,
+                    "total_digests": self.total_digests,
+                    "total_dropped": self.total_dropped,
+                    "output_position": self.output_position,
+                },
+                checkpoint_file,
+            )
+        os.replace(temporary_path, self.checkpoint_path)
+
+    def remove(self) -> None:
+        for path in (self.checkpoint_path, self.digests_path):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+        self.cursor = self.total_digests = 0
@@ -1,10 +1,11 @@
 import html
+from pathlib import Path
 from mailbox import mboxMessage
 from email.message import Message
-from typing import Callable, Dict, Optional, Union
+from typing import Callable, Dict, Optional, Sequence, Union
 
 
-from magmail.decode import _Decoder
+from magmail.decode import _Decoder, _DecodeContext
 from magmail.magmail.filter import _Filter
 from magmail.static import (
     URL_REGEX,
@@ -14,6 +15,7 @@ from magmail.static import (
     HTML_TAG_REGEX,
     MAIL_ADDRESS_REGEX,
     DEFAULT_AUTO_CLEAN,
+    DEFAULT_OVERSIZE,
     HTML_COMMENTS_REGEX,
     HTML_STYLE_TAG_REGEX,
     HTML_SCRIPT_TAG_REGEX,
@@ -30,6 +32,13 @@ class _Body:
         auto_clean: bool = DEFAULT_AUTO_CLEAN,
         filters: Dict[str, FILTER_CONTENTS_TYPE] = {},
         custom_clean_function: Optional[Callable[[str], str]] = None,
+        max_body_chars: Optional[int] = None,
+        oversize: str = DEFAULT_OVERSIZE,
+        decode_context: Optional[_DecodeContext] = None,
+        decode_hints: Sequence[str] = (),
+        mail_index: Optional[int] = None,
+        path: Optional[Union[str, Path]] = None,
+        message_charset: Optional[Callable[[], Optional[str]]] = None,
     ) -> None:
         self.body: Dict[str, Optional[str]] = {"html": "", "plain": ""}
         self.original_body: Dict[str, Optional[str]] = {"html": "", "plain": ""}
@@ -42,6 +51,16 @@ class _Body:
         self.custom_clean_function: Optional[
             Callable[[str], str]
         ] = custom_clean_function
+        self.max_body_chars = max_body_chars
+        self.oversize = oversize
+        self.truncated = False
+        # Lowest decode confidence of the text parts
+        self.confidence = 1.0
+        self.decode_context = decode_context
+        self.decode_hints = decode_hints
+        self.mail_index = mail_index
+        self.path = path
+        self.message_charset = message_charset
 
         self.walk()
 
@@ -66,17 +85,25 @@ class _Body:
 
             if payload:
                 if isinstance(payload, str):
-                    return payload
+                    return self.limit_body_value(payload)
 
                 self.decoder: _Decoder = _Decoder(
-                    byte=payload, encoding=self.content_charset[content_subtype]
+                    byte=payload,
+                    encoding=self.content_charset[content_subtype],
+                    context=self.decode_context,
+                    hints=self.decode_hints,
+                    mail_index=self.mail_index,
+                    path=self.path,
+                    message_charset=self.message_charset,
+                    part=part.get_content_type(),
                 )
                 self.decoder.decode()
 
                 self.encoding = self.decoder.encoding
                 self.original_encoding = self.decoder.original_encoding
+                self.confidence = min(self.confidence, self.decoder.confidence)
 
-                return self.decoder.decoded
+                return self.limit_body_value(self.decoder.decoded)
             else:
                 return ""
 
@@ -107,6 +134,20 @@ class _Body:
             elif content_type == "text/html":
                 self.body["html"] = get_body()
 
+    def limit_body_value(self, value: str) -> str:
+        """Cut, or drop with ``oversize="skip"``, a body over ``max_body_chars``.
+
+        Bodies are limited before being cleaned, so the regexes never run on
+        more than ``max_body_chars`` characters.
+        """
+        if self.max_body_chars is None or len(value) <= self.max_body_chars:
+            return value
+
+        self.truncated = True
+        if self.oversize == "skip":
+            return ""
+        return value[: self.max_body_chars]
+
     def clean_body_value(self, value: str) -> str:
         value = HTML_COMMENTS_REGEX.sub("", value)
         value = HTML_STYLE_TAG_REGEX.sub("", value)
@@ -1,7 +1,8 @@
+from pathlib import Path
 from email.header import decode_header
-from typing import Any, Callable, Iterator, Optional, List, Tuple
+from typing import Any, Callable, Iterator, Optional, List, Sequence, Tuple, Union
 
-from magmail.decode import _Decoder
+from magmail.decode import _Decoder, _DecodeContext
 from magmail.static import NEW_LINE_REGEX, URL_REGEX, SPACES_REGEX, DEFAULT_AUTO_CLEAN
 
 
@@ -11,9 +12,21 @@ class _Header:
         header: Tuple[str, Any],
         auto_clean: bool = DEFAULT_AUTO_CLEAN,
         custom_clean_function: Optional[Callable[[str], str]] = None,
+        decode_context: Optional[_DecodeContext] = None,
+        decode_hints: Sequence[str] = (),
+        mail_index: Optional[int] = None,
+        path: Optional[Union[str, Path]] = None,
+        message_charset: Optional[Callable[[], Optional[str]]] = None,
     ) -> None:
         self.field, self.body = header
+        self.decode_context = decode_context
+        self.decode_hints = decode_hints
+        self.mail_index = mail_index
+        self.path = path
+        self.message_charset = message_charset
         self.encoding: List[Optional[str]] = []
+        # Lowest decode confidence of the encoded words of the header
+        self.confidence = 1.0
         self.custom_clean_function = custom_clean_function
         self.auto_clean = auto_clean
 
@@ -26,10 +39,20 @@ class _Header:
         body_parts = []
         for byte, encoding in decode_header(self.body):
             if isinstance(byte, bytes):
-                self.decoder: _Decoder = _Decoder(byte=byte, encoding=encoding)
+                self.decoder: _Decoder = _Decoder(
+                    byte=byte,
+                    encoding=encoding,
+                    context=self.decode_context,
+                    hints=self.decode_hints,
+                    mail_index=self.mail_index,
+                    path=self.path,
+                    message_charset=self.message_charset,
+                    part=self.field,
+                )
                 self.decoder.decode()
 
                 self.encoding.append(self.decoder.encoding)
+                self.confidence = min(self.confidence, self.decoder.confidence)
 
                 body_parts.append(self.decoder.decoded)
             elif isinstance(byte, str):
@@ -45,6 +45,9 @@ class _Headers:
                 return self.__headers[i]
         return None
 
+    def get_headers(self) -> List[_Header]:
+        return self.__headers.copy()
+
     def has_header(self, key: str) -> bool:
         return self.search_header(key) is not None
 
@@ -92,6 +95,18 @@ class _Headers:
         self.__dict__ = value
         self.__set_attribute()
 
+    def __getstate__(self) -> Dict[str, Any]:
+        # __dict__ is overridden, so pickle needs the private state explicitly
+        return {
+            "headers": self.__headers,
+            "custom_functions": self.__custom_functions,
+        }
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__headers = state["headers"]
+        self.__custom_functions = state["custom_functions"]
+        self.__set_attribute()
+
     def __iter__(self: THeaders) -> THeaders:
         self.i = 0
         return self
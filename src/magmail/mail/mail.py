@@ -1,7 +1,8 @@
+from functools import partial
 from pathlib import Path
 from mailbox import mboxMessage
 from email.message import Message
-from typing import Any, Callable, Dict, Optional, Union
+from typing import Any, Callable, Dict, List, Optional, Union
 
 from magmail.types import CUSTOM_FUNCTIONS_ROOT_DICT_TYPE, FILTER_CONTENTS_TYPE
 
@@ -9,9 +10,13 @@ from magmail.types import CUSTOM_FUNCTIONS_ROOT_DICT_TYPE, FILTER_CONTENTS_TYPE
 from .body import _Body
 from .header import _Header
 from .headers import _Headers
+from magmail.decode import _DecodeContext, message_hints
+from magmail.decode.context import DEFAULT_DECODE_CONTEXT
+from magmail.decode.inference import infer_message_charset
 from magmail.magmail.filter import _Filter
+from magmail.magmail.parser import is_truncated
 from magmail.utils import to_attribute_name
-from magmail.static import DEFAULT_AUTO_CLEAN, CUSTOM_FUNCTIONS_DICT
+from magmail.static import DEFAULT_AUTO_CLEAN, DEFAULT_OVERSIZE, CUSTOM_FUNCTIONS_DICT
 
 
 class Mail:
@@ -26,6 +31,11 @@ class Mail:
         path: Optional[Union[str, Path]] = None,
         filters: Dict[str, FILTER_CONTENTS_TYPE] = {},
         custom_functions: CUSTOM_FUNCTIONS_ROOT_DICT_TYPE = CUSTOM_FUNCTIONS_DICT.copy(),
+        lazy: bool = False,
+        headers_only: bool = False,
+        max_body_chars: Optional[int] = None,
+        oversize: str = DEFAULT_OVERSIZE,
+        decode_context: Optional[_DecodeContext] = None,
     ):
         self.path = path
         self.index = Mail.total_instantiated
@@ -37,23 +47,120 @@ class Mail:
 
         self.custom_functions: CUSTOM_FUNCTIONS_ROOT_DICT_TYPE = custom_functions
         self.filters = _Filter(filters)
-        self.headers: _Headers = _Headers(
-            custom_functions=self.custom_functions["headers"].copy()
-        )
-        self.add_header: Callable[[_Header], None] = self.headers.add_header
-
-        self._get_headers()
-        self._get_body()
-
-        self.body = self._body.body
-        self.body_html = self._body.body_html
-        self.body_plain = self._body.body_plain
+        self.lazy = lazy
+        self.headers_only = headers_only
+        self.max_body_chars = max_body_chars
+        self.oversize = oversize
+        self.decode_context = decode_context
+
+        # In lazy mode headers and body are decoded on first access
+        self._headers: Optional[_Headers] = None
+        self._body: Optional[_Body] = None
+        self._decode_hints: Optional[List[str]] = None
+        # Whether the charset was inferred with the body parts, None until it is
+        self._inferred_with_body: Optional[bool] = None
+        self._inferred_charset: Optional[str] = None
+
+        if not self.lazy:
+            self._load_headers()
+            if not self.headers_only:
+                self._load_body()
 
     def __getitem__(self, key: str) -> Optional[Any]:
         key = to_attribute_name(key)
         return getattr(self, key, None)
 
-    def _get_headers(self) -> None:
+    @property
+    def headers(self) -> _Headers:
+        return self._load_headers()
+
+    @property
+    def body(self) -> Dict[str, Optional[str]]:
+        if self.headers_only:
+            # The message was parsed without its body
+            return {"html": "", "plain": ""}
+        return self._load_body().body
+
+    @property
+    def body_html(self) -> Optional[str]:
+        return self.body["html"]
+
+    @property
+    def body_plain(self) -> Optional[str]:
+        return self.body["plain"]
+
+    @property
+    def truncated(self) -> bool:
+        """Whether the raw message or one of its bodies was over its size limit"""
+        if is_truncated(self.message):
+            return True
+        return not self.headers_only and self._load_body().truncated
+
+    @property
+    def decode_confidence(self) -> float:
+        """Lowest share of the bytes of a header or text part decoded without
+        replacement, 0.0 when one could not be decoded at all
+        """
+        confidence = min(
+            (header.confidence for header in self._load_headers().get_headers()),
+            default=1.0,
+        )
+        if not self.headers_only:
+            confidence = min(confidence, self._load_body().confidence)
+        return confidence
+
+    def add_header(self, header: _Header) -> None:
+        self.headers.add_header(header)
+
+    def _load_headers(self) -> _Headers:
+        if self._headers is None:
+            self._headers = self._get_headers()
+        return self._headers
+
+    def _load_body(self) -> _Body:
+        if self._body is None:
+            self._body = self._get_body()
+        return self._body
+
+    @property
+    def decode_hints(self) -> List[str]:
+        """Keys of the charset priors of this mail, when the decode context has some"""
+        if self._decode_hints is None:
+            self._decode_hints = []
+            if (
+                self.decode_context is not None
+                and self.decode_context.priors is not None
+            ):
+                self._decode_hints = message_hints(self.message)
+        return self._decode_hints
+
+    def infer_charset(self, include_body: bool = True) -> Optional[str]:
+        """Charset of the undeclared headers and text parts, detected once from
+        all their bytes together, on first need.
+
+        Without ``include_body``, as for headers decoded alone in lazy mode,
+        only the headers are read. The body parts are then only read if the
+        headers gave no charset.
+        """
+        include_body = include_body and not self.headers_only
+        if self._inferred_with_body is None or (
+            include_body
+            and not self._inferred_with_body
+            and self._inferred_charset is None
+        ):
+            self._inferred_with_body = include_body
+            self._inferred_charset = infer_message_charset(
+                self.message,
+                self.decode_context
+                if self.decode_context is not None
+                else DEFAULT_DECODE_CONTEXT,
+                include_body=include_body,
+            )
+        return self._inferred_charset
+
+    def _get_headers(self) -> _Headers:
+        headers = _Headers(custom_functions=self.custom_functions["headers"].copy())
+
         for header in self.message.items():
             custom_clean_function: Optional[Callable[[str], str]] = None
 
@@ -67,15 +174,24 @@ class Mail:
                         "headers"
                     ]
 
-            self.add_header(
+            headers.add_header(
                 _Header(
                     header=header,
                     auto_clean=self.auto_clean,
                     custom_clean_function=custom_clean_function,
+                    decode_context=self.decode_context,
+                    decode_hints=self.decode_hints,
+                    mail_index=self.index,
+                    path=self.path,
+                    message_charset=partial(
+                        self.infer_charset, include_body=not self.lazy
+                    ),
                 )
             )
 
-    def _get_body(self) -> None:
+        return headers
+
+    def _get_body(self) -> _Body:
         custom_clean_function: Optional[Callable[[str], str]] = None
 
         if "clean_functions" in self.custom_functions:
@@ -84,9 +200,16 @@ class Mail:
             elif "body" in self.custom_functions["clean_functions"]:
                 custom_clean_function = self.custom_functions["clean_functions"]["body"]
 
-        self._body: _Body = _Body(
+        return _Body(
             self.message,
             auto_clean=self.auto_clean,
             filters=self.filters.filter_dict.copy(),
             custom_clean_function=custom_clean_function,
+            max_body_chars=self.max_body_chars,
+            oversize=self.oversize,
+            decode_context=self.decode_context,
+            decode_hints=self.decode_hints,
+            mail_index=self.index,
+            path=self.path,
+            message_charset=self.infer_charset,
         )
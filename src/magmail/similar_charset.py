@@ -14,13 +14,27 @@ EUC_JP_SIMILAR_CHARSET = ["euc_jp", "euc_jis_2004", "euc_jisx0213"]
 
 ASCII_SIMILAR_CHARSET = ["ascii", "utf_8"]
 
+KOREAN_SIMILAR_CHARSET = ["euc_kr", "cp949", "johab"]
+
+BIG5_SIMILAR_CHARSET = ["big5", "cp950", "big5hkscs"]
+
+# Families only hold codecs that can fail: single byte ones like koi8_r decode any
+# payload, so their failures are left to detection instead
 SIMILAR_CHARSET_LIST = [
     ISO2022_JP_SIMILAR_CHARSET_LIST,
     CP932_SIMILAR_CHARSET,
     EUC_JP_SIMILAR_CHARSET,
     ASCII_SIMILAR_CHARSET,
+    KOREAN_SIMILAR_CHARSET,
+    BIG5_SIMILAR_CHARSET,
 ]
 
+
+def similar_charset_key(charset: str) -> str:
+    """Key of ``charset`` in SIMILAR_CHARSET_DICT, for names like ``utf-8`` or ``EUC-KR``"""
+    return charset.lower().replace("-", "_")
+
+
 SIMILAR_CHARSET_DICT = {
     charset: list(filter(lambda x: x != charset, charset_list))
     for charset_list in SIMILAR_CHARSET_LIST
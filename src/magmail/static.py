@@ -12,6 +12,25 @@ from magmail.types import (
 # VARIABLES
 DEFAULT_AUTO_CLEAN = True
 
+DEFAULT_DUPLICATE_KEY = "raw"
+
+DEFAULT_READ_WORKERS = 4
+
+DEFAULT_READ_AHEAD = 64
+
+DEFAULT_OVERSIZE = "truncate"
+
+DEFAULT_QUEUE_SIZE = 64
+
+DEFAULT_CHECKPOINT_EVERY = 1000
+
+# Bytes of a payload read at most to detect its charset
+DEFAULT_DETECT_SIZE = 64 * 1024
+DEFAULT_DETECTOR = "chardet"
+DEFAULT_MAX_DECODE_EVENTS = 100
+DEFAULT_DECODE_MODE = "strict"
+DECODE_MODES = ["strict", "replace"]
+
 # REGEX
 ADDRESS_HEADER_REGEX = re.compile(
     r"[^, ].+?<[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}>|[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}"
@@ -48,6 +67,14 @@ SPACES_REGEX = re.compile(r"\s+")
 # List
 DEFAULT_COLUMNS: List[str] = ["subject", "date", "to", "cc", "h_from", "body_plain"]
 
+DUPLICATE_KEYS: List[str] = ["raw", "message_id", "fingerprint"]
+
+FINGERPRINT_HEADERS: List[str] = ["From", "To", "Cc", "Subject", "Date"]
+
+DEFAULT_EML_PATTERNS: List[str] = ["*.eml"]
+
+OVERSIZE_ACTIONS: List[str] = ["truncate", "skip"]
+
 
 # Dict
 CUSTOM_FUNCTIONS_DICT: CUSTOM_FUNCTIONS_ROOT_DICT_TYPE = {
@@ -1,4 +1,5 @@
-from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
 
 
 FILTER_CONTENTS_TYPE = Union[str, List[str]]
@@ -9,3 +10,7 @@ CUSTOM_FUNCTIONS_ROOT_DICT_TYPE = Dict[str, CUSTOM_FUNCTIONS_DICT_TYPE]
 ADDRESS_TYPE = Tuple[str, str]
 ADDRESS_HEADER_TYPE = Union[str, ADDRESS_TYPE]
 HEADER_TYPE = Union[str, ADDRESS_TYPE, List[ADDRESS_HEADER_TYPE]]
+
+
+SOURCE_TYPE = Union[str, Path]
+SOURCES_TYPE = Union[SOURCE_TYPE, Iterable[SOURCE_TYPE]]
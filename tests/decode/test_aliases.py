@@ -0,0 +1,42 @@
+import codecs
+from src.magmail.decode import _Decoder, _DecodeContext
+from src.magmail.decode.aliases import _CharsetAliases
+
+
+class TestCharsetAliases:
+    def test_messy_names(self):
+        aliases = _CharsetAliases()
+        assert aliases.name('"Shift_JIS"') == "shift_jis"
+        assert aliases.name(" UTF8 ") == "utf-8"
+        assert aliases.name("x-sjis") == "shift_jis"
+        assert aliases.name("unknown-8bit") == "shift_jis"
+        assert aliases.name("ks_c_5601-1987") == "cp949"
+
+    def test_unknown_names_are_cached(self, monkeypatch):
+        looked_up = []
+        lookup = codecs.lookup
+        monkeypatch.setattr(
+            "codecs.lookup", lambda name: looked_up.append(name) or lookup(name)
+        )
+
+        aliases = _CharsetAliases()
+        for _ in range(3):
+            assert aliases.lookup("x-unknown") is None
+            assert aliases.name("Shift_JIS") == "shift_jis"
+
+        assert looked_up == ["x-unknown", "shift_jis"]
+
+    def test_user_aliases(self):
+        aliases = _CharsetAliases({"x-custom": "euc_jp"})
+        assert aliases.name("X-Custom") == "euc_jp"
+
+        aliases.add("x-unknown", "cp932")
+        assert aliases.lookup("x-unknown") is not None
+
+    def test_decode_with_alias(self):
+        context = _DecodeContext(charset_aliases={"x-custom": "euc_jp"})
+        decoder = _Decoder("日本語".encode("euc_jp"), "x-custom", context=context)
+        decoder.decode()
+
+        assert decoder.decoded == "日本語"
+        assert decoder.encoding == "euc_jp"
@@ -0,0 +1,49 @@
+from src.magmail.decode import _Decoder, _DecodeContext
+from src.magmail.decode.cache import _DecodeCache
+
+
+class TestDecodeCache:
+    def test_hit(self):
+        context = _DecodeContext(cache_size=1024 * 1024)
+        byte = "日本語のテキスト".encode("euc_jp")
+
+        for _ in range(3):
+            decoder = _Decoder(byte, None, context=context)
+            decoder.decode()
+            assert decoder.decoded == "日本語のテキスト"
+            assert decoder.encoding == "euc_jp"
+
+        assert context.cache.stats()["hits"] == 2
+        assert context.cache.stats()["misses"] == 1
+        # Hits are counted like the payload their result was cached for
+        assert context.counters["detected"] == 3
+
+    def test_failures_are_replayed(self):
+        context = _DecodeContext(cache_size=1024 * 1024)
+
+        for i in range(3):
+            decoder = _Decoder(b"\xff body", "x-unknown", context=context, mail_index=i)
+            decoder.decode()
+            assert decoder.confidence == 0.0
+
+        assert context.cache.stats()["hits"] == 2
+        assert context.diagnostics.counts == {"unknown_encoding": 3}
+        assert [event.mail_index for event in context.diagnostics.events] == [0, 1, 2]
+        assert {event.encoding for event in context.diagnostics.events} == {"x-unknown"}
+
+    def test_declared_charset_is_part_of_the_key(self):
+        cache = _DecodeCache(1024)
+        assert cache.key(b"text", "ascii") != cache.key(b"text", None)
+
+    def test_memory_cap(self):
+        cache = _DecodeCache(200)
+        for i in range(10):
+            cache.put(
+                cache.key(str(i).encode(), None),
+                ("x" * 50, "ascii", None, 1.0, ("ascii",), ()),
+            )
+
+        assert cache.size <= 200
+        assert len(cache) < 10
+        assert cache.get(cache.key(b"9", None)) is not None
+        assert cache.get(cache.key(b"0", None)) is None
@@ -0,0 +1,335 @@
+import email
+from pathlib import Path
+from chardet.universaldetector import UniversalDetector
+from src.magmail.decode import _Decoder, _DecodeContext
+from src.magmail.decode.inference import infer_message_charset
+
+CHARSET_EML_DIR_PATH = Path(__file__).parent.parent / "test_files" / "eml" / "charset"
+
+
+def decode(byte, encoding=None):
+    decoder = _Decoder(byte, encoding, context=_DecodeContext())
+    decoder.decode()
+    return decoder
+
+
+class TestFastPath:
+    def test_ascii(self):
+        decoder = decode(b"plain text")
+        assert decoder.decoded == "plain text"
+        assert decoder.encoding == "ascii"
+        assert decoder.context.counters == {"ascii": 1}
+
+    def test_utf_8(self):
+        decoder = decode("日本語".encode("utf-8"))
+        assert decoder.decoded == "日本語"
+        assert decoder.context.counters == {"utf-8": 1}
+
+    def test_iso_2022_jp_is_detected(self):
+        decoder = decode("日本語のテキストです".encode("iso2022_jp"))
+        assert decoder.decoded == "日本語のテキストです"
+        assert decoder.context.counters["detected"] == 1
+
+    def test_declared(self):
+        decoder = decode("日本語".encode("cp932"), "shift_jis")
+        assert decoder.decoded == "日本語"
+        assert decoder.context.counters == {"declared": 1}
+
+
+class TestBoundedDetection:
+    TEXT = "これは日本語のテキストです。\n" * 2000
+
+    def test_sample_is_enough(self, monkeypatch):
+        fed = []
+        feed = UniversalDetector.feed
+        monkeypatch.setattr(
+            UniversalDetector,
+            "feed",
+            lambda self, b: fed.append(len(b)) or feed(self, b),
+        )
+
+        byte = self.TEXT.encode("euc_jp")
+        decoder = _Decoder(byte, None, context=_DecodeContext(detect_size=16384))
+        decoder.decode()
+
+        assert decoder.decoded == self.TEXT
+        assert sum(fed) <= 16384 < len(byte)
+
+    def test_unrepresentative_sample(self):
+        byte = b"a" * 20000 + self.TEXT.encode("euc_jp")
+        decoder = _Decoder(byte, None, context=_DecodeContext(detect_size=8192))
+        decoder.decode()
+
+        assert decoder.decoded == "a" * 20000 + self.TEXT
+        assert decoder.encoding == "euc_jp"
+        assert decoder.context.counters == {"detected": 1}
+
+
+class TestPriors:
+    TEXT = "これは日本語のテキストです。"
+    HINTS = ["domain:example.jp"]
+
+    def test_detected_charset_is_learned(self, tmp_path):
+        context = _DecodeContext(priors_path=tmp_path / "priors.json")
+        _Decoder(
+            self.TEXT.encode("euc_jp"), None, context=context, hints=self.HINTS
+        ).decode()
+
+        assert context.priors.candidates(self.HINTS) == ["euc_jp"]
+
+    def test_prior_skips_detection(self, tmp_path):
+        context = _DecodeContext(priors_path=tmp_path / "priors.json")
+        context.priors.record(self.HINTS, "euc_jp")
+
+        decoder = _Decoder(
+            self.TEXT.encode("euc_jp"), None, context=context, hints=self.HINTS
+        )
+        decoder.decode()
+
+        assert decoder.decoded == self.TEXT
+        assert decoder.encoding == "euc_jp"
+        assert context.counters == {"prior": 1}
+
+    def test_prior_of_failing_declared_charset(self, tmp_path):
+        context = _DecodeContext(priors_path=tmp_path / "priors.json")
+        context.priors.record(["charset:iso-2022-jp"], "cp932")
+
+        decoder = _Decoder("①日本語".encode("cp932"), "iso-2022-jp", context=context)
+        decoder.decode()
+
+        assert decoder.decoded == "①日本語"
+        assert decoder.encoding == "cp932"
+        assert decoder.original_encoding == "iso2022_jp"
+        assert context.counters["prior"] == 1
+
+
+class TestSimilarCharsets:
+    def test_families(self):
+        context = _DecodeContext()
+        assert context.similar_charsets("EUC-KR") == ["cp949", "johab"]
+        assert context.similar_charsets("big5") == ["cp950", "big5hkscs"]
+        assert context.similar_charsets("cp1251") == []
+        assert context.similar_charsets("unknown") == []
+
+    def test_mislabelled_payload(self):
+        decoder = decode("햏 한국어".encode("cp949"), "euc_kr")
+        assert decoder.decoded == "햏 한국어"
+        assert decoder.encoding == "cp949"
+        assert decoder.context.counters["similar"] == 1
+
+    def test_single_byte_failure_is_detected(self):
+        text = "Иван Иванович Иванов пишет письмо. " * 5
+        decoder = decode(text.encode("utf-8"), "cp1251")
+
+        assert decoder.decoded == text
+        assert decoder.context.counters["detected"] == 1
+        assert "similar" not in decoder.context.counters
+
+    def test_successful_charsets_first(self):
+        context = _DecodeContext()
+        context.count_similar("euc_jp", "euc_jisx0213")
+
+        assert context.similar_charsets("euc-jp") == ["euc_jisx0213", "euc_jis_2004"]
+
+    def test_collect_and_merge(self):
+        worker, parent = _DecodeContext(), _DecodeContext()
+        worker.count_similar("big5", "big5hkscs")
+
+        parent.merge(worker.collect())
+
+        assert parent.similar_charsets("big5")[0] == "big5hkscs"
+        assert worker.collect()["similar_successes"] == {}
+
+
+class TestDiagnostics:
+    def test_unknown_encoding_is_recorded(self, capsys):
+        decoder = _Decoder(
+            b"\xff" * 1000,
+            "x-unknown",
+            context=_DecodeContext(),
+            mail_index=3,
+            part="text/plain",
+        )
+        decoder.decode()
+
+        diagnostics = decoder.context.diagnostics
+        assert capsys.readouterr().out == ""
+        assert diagnostics.counts == {"unknown_encoding": 1}
+        event = diagnostics.events[0]
+        assert (event.mail_index, event.part, event.encoding) == (
+            3,
+            "text/plain",
+            "x-unknown",
+        )
+        assert event.size == 1000 and len(event.sample) < event.size
+
+    def test_undetectable_declared_payload_is_counted_once(self):
+        message = email.message_from_bytes(
+            (CHARSET_EML_DIR_PATH / "ascii" / "seeds-0.eml").read_bytes()
+        )
+        decoder = _Decoder(
+            message.get_payload(decode=True), "us-ascii", context=_DecodeContext()
+        )
+        decoder.decode()
+
+        assert decoder.encoding is None
+        assert decoder.context.diagnostics.counts == {"undecodable": 1}
+        assert decoder.context.counters == {"declared": 1, "detected": 1}
+
+    def test_logging_is_limited(self, caplog):
+        context = _DecodeContext(max_decode_events=5)
+        for _ in range(30):
+            _Decoder(b"\xff", "x-unknown", context=context).decode()
+
+        assert context.diagnostics.counts == {"unknown_encoding": 30}
+        assert len(context.diagnostics.events) == 5
+        assert len(caplog.records) < 30
+
+    def test_ignored_errors_are_not_logged(self, caplog):
+        context = _DecodeContext()
+        _Decoder(b"\xff", "x-unknown", errors="ignore", context=context).decode()
+
+        assert context.diagnostics.counts == {"unknown_encoding": 1}
+        assert caplog.records == []
+
+
+class TestReplaceMode:
+    TEXT = "これは日本語のテキストです。" * 20
+
+    def decode(self, byte, encoding, monkeypatch, message_charset=None):
+        passes = []
+        replace_payload = _Decoder.replace_payload
+        monkeypatch.setattr(
+            _Decoder,
+            "replace_payload",
+            lambda self, charset: passes.append(charset)
+            or replace_payload(self, charset),
+        )
+        decoder = _Decoder(
+            byte,
+            encoding,
+            context=_DecodeContext(decode_mode="replace"),
+            message_charset=message_charset,
+        )
+        decoder.decode()
+        return decoder, passes
+
+    def test_bad_bytes_are_replaced(self, monkeypatch):
+        byte = self.TEXT.encode("euc_jp") + b"\xff\xff" + self.TEXT.encode("euc_jp")
+        decoder, passes = self.decode(byte, "euc_jp", monkeypatch)
+
+        assert decoder.decoded.startswith(self.TEXT)
+        assert "�" in decoder.decoded
+        assert 0.9 < decoder.confidence < 1.0
+        assert len(passes) <= 2
+        assert decoder.context.diagnostics.counts == {"replaced": 1}
+
+    def test_mislabelled_payload(self, monkeypatch):
+        decoder, passes = self.decode(self.TEXT.encode("euc_jp"), "ascii", monkeypatch)
+
+        assert decoder.decoded == self.TEXT
+        assert decoder.confidence == 1.0
+        assert decoder.original_encoding == "ascii"
+        assert len(passes) == 2
+
+    def test_declared_charset_in_one_pass(self, monkeypatch):
+        decoder, passes = self.decode(self.TEXT.encode("cp932"), "cp932", monkeypatch)
+
+        assert decoder.decoded == self.TEXT
+        assert passes == ["cp932"]
+
+    def test_utf_8_in_one_pass(self, monkeypatch):
+        decoder, passes = self.decode(self.TEXT.encode("utf-8"), None, monkeypatch)
+
+        assert decoder.decoded == self.TEXT
+        assert passes == ["utf-8"]
+        assert decoder.context.counters == {"utf-8": 1}
+
+    def test_wrong_mail_charset_in_two_passes(self, monkeypatch):
+        decoder, passes = self.decode(
+            self.TEXT.encode("euc_jp"), None, monkeypatch, lambda: "ascii"
+        )
+
+        assert decoder.decoded == self.TEXT
+        assert passes == ["ascii", "euc_jp"]
+        assert decoder.encoding == "euc_jp"
+
+    def test_strict_failure_has_no_confidence(self):
+        decoder = decode(b"\xff", "x-unknown")
+        assert decoder.confidence == 0.0
+
+
+class TestMessageCharset:
+    TEXT = "これは日本語のテキストです。"
+
+    def test_undeclared_payloads_share_the_inferred_charset(self):
+        calls = []
+        context = _DecodeContext()
+        for encoding in [None, "unknown-8bit"]:
+            decoder = _Decoder(
+                self.TEXT.encode("euc_jp"),
+                encoding,
+                context=context,
+                message_charset=lambda: calls.append(1) or "euc-jp",
+            )
+            decoder.decode()
+            assert decoder.decoded == self.TEXT
+
+        assert len(calls) == 2
+        assert context.counters == {"message": 2}
+
+    def test_wrong_inference_falls_back_to_detection(self):
+        decoder = _Decoder(
+            ("日本語" * 50).encode("euc_jp"),
+            None,
+            context=_DecodeContext(),
+            message_charset=lambda: "ascii",
+        )
+        decoder.decode()
+
+        assert decoder.decoded == "日本語" * 50
+        assert decoder.context.counters["detected"] == 1
+
+    def test_replace_mode(self):
+        decoder = _Decoder(
+            self.TEXT.encode("euc_jp"),
+            None,
+            context=_DecodeContext(decode_mode="replace"),
+            message_charset=lambda: "euc-jp",
+        )
+        decoder.decode()
+
+        assert decoder.decoded == self.TEXT
+        assert decoder.context.counters == {"message": 1}
+
+    def test_sample_is_bounded(self):
+        part = "Content-Type: text/plain\n\n" + self.TEXT * 50 + "\n"
+        message = email.message_from_bytes(
+            (
+                "Content-Type: multipart/mixed; boundary=b\n\n"
+                + "".join(f"--b\n{part}" for _ in range(3))
+                + "--b--\n"
+            ).encode("euc_jp")
+        )
+        samples = []
+        context = _DecodeContext(detect_size=1000)
+        context.detector.detect = lambda byte, size: samples.append(byte) or "euc_jp"
+
+        def unread():
+            raise AssertionError("read after the sample was full")
+
+        message.get_payload()[2].get_payload = unread
+
+        assert infer_message_charset(message, context) == "euc_jp"
+        assert len(samples[0]) <= 1000
+
+    def test_headers_only(self):
+        message = email.message_from_bytes(
+            ("Subject: 日本語の件名\n\n" + self.TEXT).encode("euc_jp")
+        )
+        samples = []
+        context = _DecodeContext()
+        context.detector.detect = lambda byte, size: samples.append(byte) or "euc_jp"
+
+        infer_message_charset(message, context, include_body=False)
+        assert samples == ["日本語の件名".encode("euc_jp")]
@@ -0,0 +1,54 @@
+import importlib.util
+import pytest
+from src.magmail.decode import _Decoder, _DecodeContext, available_detectors
+from src.magmail.decode import _Detector, get_detector
+
+
+class TestDetectors:
+    def test_unknown_detector(self):
+        with pytest.raises(ValueError):
+            get_detector("unknown")
+
+    def test_detect_is_abstract(self):
+        with pytest.raises(TypeError):
+            _Detector()
+
+    @pytest.mark.parametrize("name", ["cchardet", "charset_normalizer"])
+    def test_missing_backend(self, name):
+        if importlib.util.find_spec(name) is not None:
+            pytest.skip(f"{name} is installed")
+
+        with pytest.raises(ImportError):
+            get_detector(name)
+        assert name not in available_detectors()
+
+    @pytest.mark.parametrize("name", available_detectors())
+    def test_decode_with_backend(self, name):
+        text = "これは日本語のテキストです。" * 10
+        decoder = _Decoder(
+            text.encode("euc_jp"), None, context=_DecodeContext(detector=name)
+        )
+        decoder.decode()
+
+        assert decoder.decoded == text
+
+
+class TestHeuristicDetector:
+    @pytest.mark.parametrize(
+        "text, charset",
+        [
+            ("これは日本語のテキストです。", "iso2022_jp"),
+            ("これは日本語のテキストです。", "euc_jp"),
+            ("これは日本語のテキストです。", "cp932"),
+            ("이것은 한국어 텍스트입니다.", "euc_kr"),
+            ("Это текст на русском языке.", "cp1251"),
+            ("Это текст на русском языке.", "koi8_r"),
+            ("Ceci est un texte en français, déjà écrit.", "cp1252"),
+        ],
+    )
+    def test_detect(self, text, charset):
+        encoding = get_detector("heuristic").detect(text.encode(charset))
+        assert text.encode(charset).decode(encoding) == text
+
+    def test_ascii(self):
+        assert get_detector("heuristic").detect(b"plain text") == "ascii"
@@ -0,0 +1,54 @@
+from email.message import Message
+
+from src.magmail.decode import _CharsetPriors, message_hints
+
+
+class TestCharsetPriors:
+    def test_candidates_by_success(self):
+        priors = _CharsetPriors()
+        priors.record(["domain:example.jp"], "euc_jp")
+        priors.record(["domain:example.jp", "x-mailer:mailer"], "cp932")
+        priors.record(["x-mailer:mailer"], "cp932")
+
+        assert priors.candidates(["domain:example.jp", "x-mailer:mailer"]) == [
+            "cp932",
+            "euc_jp",
+        ]
+        assert priors.candidates(["domain:unknown.jp"]) == []
+
+    def test_single_byte_charsets_are_not_learned(self):
+        priors = _CharsetPriors()
+        priors.record(["domain:example.jp"], "iso8859-1")
+        priors.record(["domain:example.jp"], "koi8_r")
+        priors.merge({"domain:example.jp": {"cp1252": 3, "shift_jis": 1}})
+
+        assert priors.candidates(["domain:example.jp"]) == ["shift_jis"]
+
+    def test_collect_and_merge(self):
+        worker, parent = _CharsetPriors(), _CharsetPriors()
+        worker.record(["charset:iso-2022-jp"], "cp932")
+
+        parent.merge(worker.collect())
+
+        assert parent.candidates(["charset:iso-2022-jp"]) == ["cp932"]
+        assert worker.collect() == {}
+
+    def test_save_and_load(self, tmp_path):
+        priors_path = tmp_path / "priors.json"
+        priors = _CharsetPriors(priors_path)
+        priors.record(["domain:example.jp"], "euc_jp")
+        priors.save()
+
+        loaded = _CharsetPriors(priors_path)
+        assert loaded.load()
+        assert loaded.candidates(["domain:example.jp"]) == ["euc_jp"]
+
+    def test_missing_file(self, tmp_path):
+        assert not _CharsetPriors(tmp_path / "priors.json").load()
+
+    def test_message_hints(self):
+        message = Message()
+        message["From"] = "Sender <sender@Example.JP>"
+        message["X-Mailer"] = "Mailer 1.0"
+
+        assert message_hints(message) == ["domain:example.jp", "x-mailer:Mailer 1.0"]
@@ -0,0 +1,755 @@
+import asyncio
+import bz2
+import email
+import gzip
+import json
+import lzma
+import mailbox
+import tarfile
+import pytest
+from pathlib import Path
+from src.magmail import Magmail
+from src.magmail.magmail import scanner
+from src.magmail.magmail.mbox_index import _MboxIndex
+
+EML_DIR_PATH = Path(__file__).parent.parent / "test_files" / "eml" / "normal_en"
+
+
+@pytest.fixture
+def mbox_path(tmp_path):
+    path = tmp_path / "normal_en.mbox"
+    mail_box = mailbox.mbox(path)
+    for eml_path in sorted(EML_DIR_PATH.glob("*.eml"))[:10]:
+        mail_box.add(eml_path.read_bytes())
+    mail_box.flush()
+    mail_box.close()
+    return path
+
+
+class TestStream:
+    def test_stream_yields_all_mails(self, mbox_path):
+        subjects = [mail.headers.subject for mail in Magmail.stream(mbox_path)]
+        assert subjects == [mail.headers.subject for mail in Magmail(mbox_path)]
+
+    def test_stream_does_not_keep_mails(self, mbox_path):
+        magmail = Magmail(mbox_path, stream=True)
+        assert len(list(magmail)) == 10
+        assert len(magmail) == 0
+
+    def test_stream_can_be_iterated_again(self, tmp_path, mbox_path):
+        magmail = Magmail(mbox_path, stream=True)
+        first = [mail.headers.subject for mail in magmail]
+
+        assert [mail.headers.subject for mail in magmail] == first
+        assert magmail.total_duplicates == 0
+
+        csv_path = tmp_path / "mails.csv"
+        magmail.export_csv(csv_path)
+        assert len(csv_path.read_text().splitlines()) > 1
+
+    def test_rejected_export_keeps_files(self, tmp_path, mbox_path):
+        csv_path = tmp_path / "mails-1.csv"
+        csv_path.write_text("existing")
+
+        with pytest.raises(ValueError):
+            Magmail(mbox_path, stream=True).export_csv(
+                tmp_path / "mails.csv", slice_files=2
+            )
+        assert csv_path.read_text() == "existing"
+
+    def test_stream_drops_duplicates(self, tmp_path, mbox_path):
+        path = tmp_path / "duplicated.mbox"
+        mail_box = mailbox.mbox(path)
+        for message in mailbox.mbox(mbox_path):
+            mail_box.add(message)
+            mail_box.add(message)
+        mail_box.flush()
+        mail_box.close()
+
+        assert len(list(Magmail.stream(path))) == 10
+        assert len(list(Magmail.stream(path, drop_duplicates=False))) == 20
+
+
+class TestDuplicates:
+    @pytest.fixture
+    def duplicated_mbox_path(self, tmp_path, mbox_path):
+        path = tmp_path / "duplicated.mbox"
+        mail_box = mailbox.mbox(path)
+        for i, message in enumerate(mailbox.mbox(mbox_path)):
+            message["Message-ID"] = f"<{i}@example.com>"
+            mail_box.add(message)
+            mail_box.add(message)
+            del message["Message-ID"]
+            message["Message-ID"] = f"<{i}@example.com>"
+            message["X-Resent"] = "yes"
+            mail_box.add(message)
+        mail_box.flush()
+        mail_box.close()
+        return path
+
+    def test_raw_key(self, duplicated_mbox_path):
+        magmail = Magmail(duplicated_mbox_path)
+        assert len(magmail) == 20
+        assert magmail.total_duplicates == 10
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_raw_key_hashes_source_bytes(
+        self, duplicated_mbox_path, monkeypatch, workers
+    ):
+        def as_bytes(*args, **kwargs):
+            raise AssertionError("the message was serialized again")
+
+        monkeypatch.setattr(email.message.Message, "as_bytes", as_bytes)
+
+        magmail = Magmail(duplicated_mbox_path, workers=workers)
+        assert len(magmail) == 20
+        assert magmail.total_duplicates == 10
+
+    def test_message_id_key(self, duplicated_mbox_path):
+        magmail = Magmail(duplicated_mbox_path, duplicate_key="message_id")
+        assert len(magmail) == 10
+        assert magmail.total_duplicates == 20
+
+    def test_fingerprint_key(self, duplicated_mbox_path):
+        magmail = Magmail(duplicated_mbox_path, duplicate_key="fingerprint")
+        assert len(magmail) == 10
+
+    def test_unknown_key(self, mbox_path):
+        with pytest.raises(ValueError):
+            Magmail(mbox_path, duplicate_key="unknown")
+
+
+class TestMboxIndex:
+    def test_same_messages_as_mailbox(self, mbox_path):
+        messages = list(_MboxIndex(mbox_path).iter_messages())
+        expected = list(mailbox.mbox(mbox_path))
+
+        assert [message.as_bytes() for message in messages] == [
+            message.as_bytes() for message in expected
+        ]
+        assert [message.get_from() for message in messages] == [
+            message.get_from() for message in expected
+        ]
+
+    def test_index_file_is_reused(self, mbox_path, monkeypatch):
+        mbox_index = _MboxIndex(mbox_path)
+        assert mbox_index.index_path.exists()
+
+        monkeypatch.setattr(_MboxIndex, "scan", lambda self: pytest.fail("rescan"))
+        assert list(_MboxIndex(mbox_path)) == list(mbox_index)
+
+    def test_index_file_is_invalidated(self, mbox_path):
+        _MboxIndex(mbox_path)
+        with open(mbox_path, "ab") as mbox_file:
+            mbox_file.write(b"From MAILER-DAEMON\nSubject: new\n\nbody\n")
+
+        assert len(_MboxIndex(mbox_path)) == 11
+
+    def test_random_access_in_streaming_mode(self, mbox_path):
+        expected = Magmail(mbox_path)
+        magmail = Magmail(mbox_path, stream=True)
+
+        assert magmail[3].headers.subject == expected[3].headers.subject
+        assert [mail.headers.subject for mail in magmail[2:8:2]] == [
+            mail.headers.subject for mail in expected[2:8:2]
+        ]
+
+
+class TestWorkers:
+    def test_parallel_parse_keeps_order(self, mbox_path):
+        expected = Magmail(mbox_path)
+        magmail = Magmail(mbox_path, workers=2)
+
+        assert [mail.headers.subject for mail in magmail] == [
+            mail.headers.subject for mail in expected
+        ]
+        first_index = magmail[0].index
+        assert [mail.index for mail in magmail] == list(
+            range(first_index, first_index + 10)
+        )
+
+    def test_parallel_stream(self, mbox_path):
+        assert len(list(Magmail.stream(mbox_path, workers=2))) == 10
+
+    def test_decode_counters_are_merged(self, mbox_path):
+        expected = Magmail(mbox_path).decode_counters
+        assert sum(expected.values()) > 0
+        assert Magmail(mbox_path, workers=2).decode_counters == expected
+
+
+class TestIncremental:
+    NEW_MESSAGE = b"From MAILER-DAEMON\nSubject: appended\n\nbody\n"
+
+    def test_refresh_parses_appended_messages(self, mbox_path):
+        magmail = Magmail(mbox_path)
+        with open(mbox_path, "ab") as mbox_file:
+            mbox_file.write(b"\n" + self.NEW_MESSAGE)
+
+        new_mails = magmail.refresh()
+        assert [mail.headers.subject for mail in new_mails] == ["appended"]
+        assert len(magmail) == 11
+        assert magmail.refresh() == []
+
+    def test_refresh_rescans_rewritten_file(self, mbox_path):
+        magmail = Magmail(mbox_path)
+        mbox_path.write_bytes(self.NEW_MESSAGE)
+
+        assert len(magmail.refresh()) == 1
+        assert len(magmail) == 1
+
+    def test_refresh_keeps_other_sources(self, tmp_path, mbox_path):
+        other_path = tmp_path / "other.mbox"
+        other_path.write_bytes(self.NEW_MESSAGE.replace(b"appended", b"other"))
+        magmail = Magmail([mbox_path, other_path])
+        mbox_path.write_bytes(self.NEW_MESSAGE)
+
+        magmail.refresh()
+        assert [mail.headers.subject for mail in magmail] == ["appended", "other"]
+
+    def test_refresh_keeps_other_files_of_directory(self, tmp_path, mbox_path):
+        directory = tmp_path / "mails.mbox"
+        directory.mkdir()
+        (directory / "a.mbox").write_bytes(self.NEW_MESSAGE)
+        (directory / "b.mbox").write_bytes(
+            self.NEW_MESSAGE.replace(b"appended", b"other")
+        )
+        magmail = Magmail(directory)
+        (directory / "a.mbox").write_bytes(
+            self.NEW_MESSAGE.replace(b"appended", b"rewritten")
+        )
+
+        magmail.refresh()
+        assert [mail.headers.subject for mail in magmail] == ["rewritten", "other"]
+
+    def test_state_is_persisted(self, mbox_path):
+        assert len(Magmail(mbox_path, incremental=True)) == 10
+        assert len(Magmail(mbox_path, incremental=True)) == 0
+
+        with open(mbox_path, "ab") as mbox_file:
+            mbox_file.write(b"\n" + self.NEW_MESSAGE)
+
+        magmail = Magmail(mbox_path, incremental=True, workers=2)
+        assert [mail.headers.subject for mail in magmail] == ["appended"]
+        assert len(Magmail(mbox_path)) == 11
+
+
+class TestEmlDirectory:
+    @pytest.fixture
+    def eml_dir_path(self, tmp_path):
+        for i, eml_path in enumerate(sorted(EML_DIR_PATH.glob("*.eml"))[:9]):
+            directory = tmp_path / "mails" / f"{i % 3}"
+            directory.mkdir(parents=True, exist_ok=True)
+            (directory / eml_path.name).write_bytes(eml_path.read_bytes())
+        (tmp_path / "mails" / "note.txt").write_text("not a mail")
+        return tmp_path / "mails"
+
+    def test_directory(self):
+        assert len(Magmail(EML_DIR_PATH)) == 75
+
+    def test_not_recursive_by_default(self, eml_dir_path):
+        assert len(Magmail(eml_dir_path)) == 0
+
+    def test_recursive(self, eml_dir_path):
+        assert len(Magmail(eml_dir_path, recursive=True)) == 9
+        assert len(Magmail(eml_dir_path, recursive=True, read_workers=1)) == 9
+
+    def test_natural_order(self, tmp_path):
+        for name in ["mail-10", "mail-2", "mail-1"]:
+            (tmp_path / f"{name}.eml").write_bytes(
+                f"Subject: {name}\n\nbody\n".encode()
+            )
+
+        magmail = Magmail(tmp_path)
+        assert [mail.headers.subject for mail in magmail] == [
+            "mail-1",
+            "mail-2",
+            "mail-10",
+        ]
+
+    def test_patterns(self, eml_dir_path):
+        magmail = Magmail(eml_dir_path, recursive=True, eml_patterns=["seeds-0.*"])
+        assert len(magmail) == 1
+
+
+class TestArchive:
+    @pytest.mark.parametrize(
+        "suffix, compress", [(".gz", gzip), (".bz2", bz2), (".xz", lzma)]
+    )
+    def test_compressed_mbox(self, tmp_path, mbox_path, suffix, compress):
+        path = tmp_path / f"normal_en.mbox{suffix}"
+        path.write_bytes(compress.compress(mbox_path.read_bytes()))
+
+        assert [mail.headers.subject for mail in Magmail(path)] == [
+            mail.headers.subject for mail in Magmail(mbox_path)
+        ]
+        assert len(Magmail(path, workers=2)) == 10
+
+    def test_eml_tarball(self, tmp_path):
+        path = tmp_path / "normal_en.tar.gz"
+        with tarfile.open(path, "w:gz") as archive:
+            archive.add(EML_DIR_PATH, arcname="normal_en")
+
+        assert len(Magmail(path)) == 75
+        assert len(Magmail(path, eml_patterns=["seeds-1.eml"])) == 1
+
+
+class TestMailFolder:
+    @pytest.fixture
+    def maildir_path(self, tmp_path, mbox_path):
+        path = tmp_path / "Maildir"
+        maildir = mailbox.Maildir(path)
+        for i, message in enumerate(mailbox.mbox(mbox_path)):
+            maildir_message = mailbox.MaildirMessage(message)
+            if i % 2:
+                maildir_message.set_subdir("cur")
+                maildir_message.set_flags("S")
+            maildir.add(maildir_message)
+        return path
+
+    def test_maildir(self, maildir_path):
+        assert len(Magmail(maildir_path)) == 10
+        assert len(Magmail(maildir_path, workers=2)) == 10
+
+    def test_mh(self, tmp_path, mbox_path):
+        path = tmp_path / "mh"
+        mh = mailbox.MH(path)
+        for message in mailbox.mbox(mbox_path):
+            mh.add(message)
+
+        assert [mail.headers.subject for mail in Magmail(path)] == [
+            mail.headers.subject for mail in Magmail(mbox_path)
+        ]
+
+    def test_maildir_sync(self, maildir_path):
+        assert len(Magmail(maildir_path, incremental=True)) == 10
+
+        maildir = mailbox.Maildir(maildir_path)
+        for key in maildir.keys():
+            maildir_message = maildir[key]
+            maildir_message.set_subdir("cur")
+            maildir_message.add_flag("R")
+            maildir[key] = maildir_message
+        maildir.add(b"Subject: new\n\nbody\n")
+
+        magmail = Magmail(maildir_path, incremental=True)
+        assert [mail.headers.subject for mail in magmail] == ["new"]
+
+    def test_maildir_refresh(self, maildir_path):
+        magmail = Magmail(maildir_path)
+        mailbox.Maildir(maildir_path).add(b"Subject: new\n\nbody\n")
+
+        assert [mail.headers.subject for mail in magmail.refresh()] == ["new"]
+        assert len(magmail) == 11
+
+
+class TestHeadersOnly:
+    def test_headers_only(self, mbox_path):
+        expected = Magmail(mbox_path)
+        magmail = Magmail(mbox_path, headers_only=True)
+
+        assert [mail.headers.subject for mail in magmail] == [
+            mail.headers.subject for mail in expected
+        ]
+        assert all(mail._body is None for mail in magmail)
+        assert all(mail.body_plain == "" for mail in magmail)
+        assert all(mail.message.get_payload() == "" for mail in magmail)
+
+    def test_headers_only_eml(self):
+        magmail = Magmail(EML_DIR_PATH, headers_only=True, workers=2)
+        assert len(magmail) == 75
+        assert all(mail.headers.date is not None for mail in magmail)
+
+
+class TestSizeLimits:
+    @pytest.fixture
+    def large_mbox_path(self, tmp_path, mbox_path):
+        path = tmp_path / "large.mbox"
+        mail_box = mailbox.mbox(path)
+        mail_box.add(
+            b"From: a@example.com\nSubject: large\n"
+            b"Content-Type: text/plain; charset=us-ascii\n\n" + b"x" * 10000 + b"\n"
+        )
+        for message in mailbox.mbox(mbox_path):
+            mail_box.add(message)
+        mail_box.flush()
+        mail_box.close()
+        return path
+
+    def test_truncate(self, large_mbox_path):
+        magmail = Magmail(large_mbox_path, max_message_size=1000)
+        assert len(magmail) == 11
+        assert magmail[0].truncated
+        assert magmail[0].headers.subject == "large"
+        assert len(magmail[0].body_plain) < 1000
+        assert magmail.total_skipped == 0
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_skip(self, large_mbox_path, workers):
+        magmail = Magmail(
+            large_mbox_path, max_message_size=5000, oversize="skip", workers=workers
+        )
+        assert len(magmail) == 10
+        assert not any(mail.truncated for mail in magmail)
+        assert magmail.total_skipped == 1
+
+    @pytest.mark.parametrize("read_workers", [1, 4])
+    def test_directory_reads_are_bounded(self, tmp_path, monkeypatch, read_workers):
+        directory = tmp_path / "mails"
+        directory.mkdir()
+        (directory / "large.eml").write_bytes(
+            b"Subject: large\n" + b"X-Long: " + b"y" * 2000 + b"\n\n" + b"x" * 100000
+        )
+        (directory / "small.eml").write_bytes(b"Subject: small\n\nbody\n")
+        sizes = []
+        read_file = scanner.read_file
+
+        def spy(*args, **kwargs):
+            data, size = read_file(*args, **kwargs)
+            sizes.append(len(data))
+            return data, size
+
+        monkeypatch.setattr(scanner, "read_file", spy)
+
+        magmail = Magmail(directory, max_message_size=1000, read_workers=read_workers)
+        assert [mail.headers.subject for mail in magmail] == ["large", "small"]
+        assert [mail.truncated for mail in magmail] == [True, False]
+        assert max(sizes) < 100000
+
+    def test_max_body_chars(self, large_mbox_path):
+        magmail = Magmail(large_mbox_path, max_body_chars=100)
+        assert magmail[0].truncated
+        assert magmail[0].body_plain == "x" * 100
+
+        magmail = Magmail(large_mbox_path, max_body_chars=100, oversize="skip")
+        assert magmail[0].truncated
+        assert magmail[0].body_plain == ""
+
+    def test_unknown_oversize(self, mbox_path):
+        with pytest.raises(ValueError):
+            Magmail(mbox_path, oversize="drop")
+
+
+class TestAsync:
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_aiter(self, mbox_path, workers):
+        async def subjects():
+            return [
+                mail.headers.subject
+                async for mail in Magmail.aiter(mbox_path, workers=workers)
+            ]
+
+        expected = [mail.headers.subject for mail in Magmail(mbox_path)]
+        assert asyncio.run(subjects()) == expected
+
+    def test_aiter_early_break(self, mbox_path):
+        async def first():
+            async for mail in Magmail.aiter(mbox_path, queue_size=1):
+                return mail.headers.subject
+
+        assert asyncio.run(first()) == Magmail(mbox_path)[0].headers.subject
+
+    def test_aiter_raises(self, tmp_path):
+        async def consume():
+            return [mail async for mail in Magmail.aiter(tmp_path / "missing.mbox")]
+
+        with pytest.raises(FileNotFoundError):
+            asyncio.run(consume())
+
+
+class TestCheckpoint:
+    def test_resume_stream(self, tmp_path, mbox_path):
+        checkpoint = tmp_path / "checkpoint.json"
+        expected = [mail.headers.subject for mail in Magmail(mbox_path)]
+
+        mails = Magmail.stream(mbox_path, checkpoint=checkpoint, checkpoint_every=3)
+        assert [next(mails).headers.subject for _ in range(7)] == expected[:7]
+        assert checkpoint.exists()
+
+        resumed = Magmail.stream(mbox_path, checkpoint=checkpoint, checkpoint_every=3)
+        assert [mail.headers.subject for mail in resumed] == expected[6:]
+        assert not checkpoint.exists()
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_resume_export(self, tmp_path, mbox_path, monkeypatch, workers):
+        checkpoint = tmp_path / "checkpoint.json"
+        csv_path = tmp_path / "mails.csv"
+        expected = Magmail(mbox_path)
+        expected.export_csv(tmp_path / "expected.csv")
+
+        # The class of the mails, as imported by Magmail
+        mail_class = type(expected[0])
+        body_plain = mail_class.body_plain
+        calls = []
+
+        def crash(mail):
+            calls.append(mail)
+            if len(calls) == 6:
+                raise MemoryError
+            return body_plain.fget(mail)
+
+        monkeypatch.setattr(mail_class, "body_plain", property(crash))
+        magmail = Magmail(
+            mbox_path,
+            stream=True,
+            checkpoint=checkpoint,
+            checkpoint_every=2,
+            workers=workers,
+        )
+        with pytest.raises(MemoryError):
+            magmail.export_csv(csv_path)
+        monkeypatch.undo()
+
+        magmail = Magmail(
+            mbox_path, stream=True, checkpoint=checkpoint, workers=workers
+        )
+        magmail.export_csv(csv_path)
+
+        assert csv_path.read_text() == (tmp_path / "expected.csv").read_text()
+        assert not checkpoint.exists()
+
+    def test_other_source_is_not_resumed(self, tmp_path, mbox_path):
+        checkpoint = tmp_path / "checkpoint.json"
+        mails = Magmail.stream(mbox_path, checkpoint=checkpoint, checkpoint_every=1)
+        next(mails), next(mails), next(mails)
+
+        resumed = Magmail.stream(EML_DIR_PATH, checkpoint=checkpoint)
+        assert len(list(resumed)) == 75
+
+    def test_digests_are_appended(self, tmp_path, mbox_path):
+        checkpoint = tmp_path / "checkpoint.json"
+        digests_path = tmp_path / "checkpoint.json.digests"
+        mails = Magmail.stream(mbox_path, checkpoint=checkpoint, checkpoint_every=2)
+
+        next(mails), next(mails), next(mails)
+        assert digests_path.stat().st_size == 2 * 16
+        next(mails), next(mails)
+        assert digests_path.stat().st_size == 4 * 16
+        assert "digests" not in json.loads(checkpoint.read_text())
+
+        list(mails)
+        assert not digests_path.exists()
+
+    def test_checkpoint_requires_stream(self, tmp_path, mbox_path):
+        with pytest.raises(ValueError):
+            Magmail(mbox_path, checkpoint=tmp_path / "checkpoint.json")
+
+
+class TestMultipleSources:
+    @pytest.fixture
+    def sources(self, tmp_path, mbox_path):
+        archive_path = tmp_path / "normal_jp.tar"
+        with tarfile.open(archive_path, "w") as archive:
+            archive.add(EML_DIR_PATH.parent / "normal_jp", arcname="normal_jp")
+        return [mbox_path, EML_DIR_PATH, archive_path]
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_sources_are_merged_in_order(self, sources, workers):
+        magmail = Magmail(sources, workers=workers)
+
+        expected = [
+            mail.headers.subject for source in sources for mail in Magmail(source)
+        ]
+        assert [mail.headers.subject for mail in magmail] == expected
+        assert [stats.messages for stats in magmail.stats.values()] == [10, 75, 75]
+        assert magmail.stats[sources[0]].bytes == sources[0].stat().st_size
+        assert magmail.stats[sources[1]].bytes == sum(
+            file.stat().st_size for file in EML_DIR_PATH.glob("*.eml")
+        )
+        assert all(stats.parse_time > 0 for stats in magmail.stats.values())
+
+    def test_glob(self, tmp_path, mbox_path):
+        copy_path = tmp_path / "copy.mbox"
+        copy_path.write_bytes(mbox_path.read_bytes())
+        Magmail(mbox_path)
+
+        magmail = Magmail(str(tmp_path / "*.mbox"), drop_duplicates=False)
+        assert magmail.sources == [copy_path, mbox_path]
+        assert len(magmail) == 20
+
+    def test_bracketed_file_name(self, tmp_path):
+        path = tmp_path / "mail[2023].eml"
+        path.write_bytes(b"Subject: bracketed\n\nbody\n")
+
+        magmail = Magmail(str(path))
+        assert magmail.sources == [path]
+        assert magmail[0].headers.subject == "bracketed"
+
+    def test_glob_without_match(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            Magmail(str(tmp_path / "*.mbox"))
+
+    def test_add_mbox_directory(self, tmp_path, mbox_path):
+        directory = tmp_path / "archive.mbox"
+        directory.mkdir()
+        (directory / "2023.mbox").write_bytes(mbox_path.read_bytes())
+
+        magmail = Magmail(mbox_path, drop_duplicates=False)
+        magmail.add_mbox(directory)
+        assert len(magmail) == 20
+
+
+class TestDecodeCache:
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_repeated_payloads_are_cached(self, mbox_path, workers):
+        mbox_path.write_bytes(mbox_path.read_bytes() * 3)
+        magmail = Magmail(
+            mbox_path,
+            drop_duplicates=False,
+            decode_cache_size=1024 * 1024,
+            workers=workers,
+        )
+
+        stats = magmail.decode_cache_stats
+        assert len(magmail) == 30
+        assert stats["hits"] > 0
+
+    def test_disabled_by_default(self, mbox_path):
+        assert Magmail(mbox_path).decode_cache_stats is None
+
+
+class TestCharsetPriors:
+    @pytest.fixture
+    def undeclared_mbox_path(self, tmp_path):
+        path = tmp_path / "undeclared.mbox"
+        mail_box = mailbox.mbox(path)
+        for i in range(4):
+            mail_box.add(
+                b"From: sender@example.jp\n"
+                + f"Subject: {i}\n".encode()
+                + b"Content-Type: text/plain\n\n"
+                + f"{i}番目の日本語のメールです。".encode("euc_jp")
+                + b"\n"
+            )
+        mail_box.flush()
+        return path
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_priors_are_persisted(self, tmp_path, undeclared_mbox_path, workers):
+        priors_path = tmp_path / "priors.json"
+        first = Magmail(
+            undeclared_mbox_path, charset_priors=priors_path, workers=workers
+        )
+        second = Magmail(undeclared_mbox_path, charset_priors=priors_path)
+
+        assert priors_path.exists()
+        assert second.decode_counters["prior"] == 4
+        assert "detected" not in second.decode_counters
+        assert [mail.body_plain for mail in first] == [
+            mail.body_plain for mail in second
+        ]
+
+    def test_sender_mixing_charsets(self, tmp_path):
+        path = tmp_path / "mixed.mbox"
+        mail_box = mailbox.mbox(path)
+        bodies = [
+            ("Le café est très apprécié à Genève et à Besançon.", "latin-1"),
+            ("これは日本語で書かれたメールの本文です。", "shift_jis"),
+        ]
+        for text, charset in bodies:
+            mail_box.add(
+                b"From: x@example.jp\nContent-Type: text/plain\n\n"
+                + text.encode(charset)
+                + b"\n"
+            )
+        mail_box.flush()
+        priors_path = tmp_path / "priors.json"
+
+        for _ in range(2):
+            magmail = Magmail(path, charset_priors=priors_path)
+            assert [mail.body_plain.strip() for mail in magmail] == [
+                text for text, _ in bodies
+            ]
+
+
+class TestDetector:
+    def test_heuristic_detector(self, mbox_path):
+        assert len(Magmail(mbox_path, detector="heuristic")) == 10
+
+    def test_unknown_detector(self, mbox_path):
+        with pytest.raises(ValueError):
+            Magmail(mbox_path, detector="unknown")
+
+
+class TestDecodeDiagnostics:
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_failures_are_collected(self, tmp_path, workers):
+        path = tmp_path / "unknown.mbox"
+        mail_box = mailbox.mbox(path)
+        for i in range(6):
+            mail_box.add(
+                f"Subject: {i}\nContent-Type: text/plain; charset=x-unknown\n\n".encode()
+                + b"\xff\xfe body\n"
+            )
+        mail_box.flush()
+
+        magmail = Magmail(path, workers=workers)
+
+        assert magmail.decode_errors == {"unknown_encoding": 6}
+        assert {event.part for event in magmail.decode_events} == {"text/plain"}
+        assert [event.mail_index for event in magmail.decode_events] == [
+            mail.index for mail in magmail
+        ]
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_charset_aliases(self, tmp_path, workers):
+        path = tmp_path / "alias.mbox"
+        mail_box = mailbox.mbox(path)
+        mail_box.add(
+            b"Subject: alias\nContent-Type: text/plain; charset=x-unknown\n\n"
+            + "日本語の本文".encode("euc_jp")
+            + b"\n"
+        )
+        mail_box.flush()
+
+        magmail = Magmail(
+            path, charset_aliases={"x-unknown": "euc_jp"}, workers=workers
+        )
+
+        assert magmail.decode_errors == {}
+        assert magmail[0].body_plain == "日本語の本文"
+
+    def test_no_failure(self, mbox_path):
+        magmail = Magmail(mbox_path)
+        assert magmail.decode_errors == {}
+        assert magmail.decode_events == []
+
+
+class TestDecodeMode:
+    def test_confidence(self, mbox_path):
+        magmail = Magmail(mbox_path, decode_mode="replace")
+        assert all(mail.decode_confidence == 1.0 for mail in magmail)
+
+    def test_unknown_decode_mode(self, mbox_path):
+        with pytest.raises(ValueError):
+            Magmail(mbox_path, decode_mode="unknown")
+
+
+class TestMessageCharset:
+    @pytest.fixture
+    def raw_8bit_mbox_path(self, tmp_path):
+        path = tmp_path / "raw_8bit.mbox"
+        mail_box = mailbox.mbox(path)
+        for i in range(3):
+            mail_box.add(
+                (
+                    f"Subject: {i}番目の件名です\n"
+                    "From: 送信者 <sender@example.jp>\n"
+                    "Content-Type: text/plain\n\n"
+                    "これは日本語のメールの本文です。\n"
+                ).encode("euc_jp")
+            )
+        mail_box.flush()
+        return path
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_one_detection_per_mail(self, raw_8bit_mbox_path, workers):
+        magmail = Magmail(raw_8bit_mbox_path, workers=workers)
+        counters = magmail.decode_counters
+
+        assert [mail.headers.subject for mail in magmail] == [
+            f"{i}番目の件名です" for i in range(3)
+        ]
+        assert magmail[0].body_plain == "これは日本語のメールの本文です。"
+        assert counters["message_detected"] == 3
+        assert counters["message"] == 9
+        assert "detected" not in counters
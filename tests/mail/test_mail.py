@@ -0,0 +1,44 @@
+import email
+from pathlib import Path
+from src.magmail.mail import Mail
+
+EML_PATH = (
+    Path(__file__).parent.parent / "test_files" / "eml" / "normal_jp" / "seeds-0.eml"
+)
+
+
+class TestLazyMail:
+    def setup_method(self):
+        self.message = email.message_from_bytes(EML_PATH.read_bytes())
+
+    def test_nothing_decoded_on_init(self):
+        mail = Mail(self.message, lazy=True)
+        assert mail._headers is None
+        assert mail._body is None
+
+    def test_headers_do_not_decode_body(self):
+        mail = Mail(self.message, lazy=True)
+        assert mail.headers.subject == Mail(self.message).headers.subject
+        assert mail._body is None
+
+    def test_body_is_cached(self):
+        mail = Mail(self.message, lazy=True)
+        assert mail.body_plain == Mail(self.message).body_plain
+        assert mail._load_body() is mail._load_body()
+
+    def test_raw_8bit_headers_do_not_read_body(self, monkeypatch):
+        message = email.message_from_bytes(
+            "Subject: 日本語の件名\n\n日本語の本文\n".encode("euc_jp")
+        )
+        reads = []
+        get_payload = message.get_payload
+        monkeypatch.setattr(
+            message,
+            "get_payload",
+            lambda *args, **kwargs: reads.append(1) or get_payload(*args, **kwargs),
+        )
+
+        mail = Mail(message, lazy=True)
+        assert mail.headers.subject == "日本語の件名"
+        assert reads == []
+        assert mail.body_plain.strip() == "日本語の本文"